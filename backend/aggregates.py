@@ -0,0 +1,149 @@
+"""
+Running totals behind /api/stats, maintained as deltas on every user write
+"""
+
+import threading
+from datetime import datetime
+
+# Differences smaller than this are float noise, not drift worth reporting
+DRIFT_TOLERANCE = 0.005
+
+# The only user fields the totals are computed from, plus the email that
+# lets reconcile() swap out one user's contribution
+STATS_FIELDS = ['email', 'department', 'donationsRaised', 'totalReferrals']
+
+
+def _contribution(user):
+    """Return (department, donations, referrals) for a single user"""
+    return (
+        user.get('department', 'Unknown'),
+        float(user.get('donationsRaised', 0) or 0),
+        int(user.get('totalReferrals', 0) or 0),
+    )
+
+
+def _compute(users):
+    """Compute aggregate totals from scratch"""
+    totals = {'users': 0, 'donations': 0.0, 'referrals': 0, 'departments': {}}
+    for user in users:
+        _add(totals, user, 1)
+    return totals
+
+
+def _add(totals, user, sign):
+    dept, donations, referrals = _contribution(user)
+    totals['users'] += sign
+    totals['donations'] += sign * donations
+    totals['referrals'] += sign * referrals
+
+    department = totals['departments'].setdefault(dept, {'count': 0, 'donations': 0})
+    department['count'] += sign
+    department['donations'] += sign * donations
+    if department['count'] <= 0:
+        del totals['departments'][dept]
+
+
+def _differences(current, expected):
+    """List the fields where running totals drifted from a full recount"""
+    diffs = []
+    for field in ('users', 'donations', 'referrals'):
+        if abs(current[field] - expected[field]) > DRIFT_TOLERANCE:
+            diffs.append({'field': field, 'was': current[field], 'expected': expected[field]})
+
+    for dept in sorted(set(current['departments']) | set(expected['departments'])):
+        was = current['departments'].get(dept, {'count': 0, 'donations': 0})
+        want = expected['departments'].get(dept, {'count': 0, 'donations': 0})
+        if was['count'] != want['count'] or abs(was['donations'] - want['donations']) > DRIFT_TOLERANCE:
+            diffs.append({'field': f'departments.{dept}', 'was': was, 'expected': want})
+    return diffs
+
+
+class StatsAggregator:
+    """Global and per-department totals updated in O(1) per write"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = _compute([])
+        # email -> user after the latest write (None for a removal) applied
+        # while reconcile() loads users
+        self._journal = None
+        self.ready = False
+        self.last_reconciliation = None
+
+    def rebuild(self, users):
+        """Replace the running totals with a full recount"""
+        totals = _compute(users)
+        with self._lock:
+            self._totals = totals
+            self.ready = True
+
+    def apply(self, before, after):
+        """Apply the change from `before` to `after` (either may be None)"""
+        with self._lock:
+            if before is not None:
+                _add(self._totals, before, -1)
+            if after is not None:
+                _add(self._totals, after, 1)
+            if self._journal is not None:
+                email = (after or before or {}).get('email')
+                if email:
+                    self._journal[email] = after
+
+    def snapshot(self):
+        """Return the totals in the /api/stats response format"""
+        with self._lock:
+            totals = self._totals
+            total_users = totals['users']
+            total_donations = totals['donations']
+            departments = {
+                dept: {'count': values['count'], 'donations': round(values['donations'], 2)}
+                for dept, values in totals['departments'].items()
+            }
+
+        return {
+            'totalUsers': total_users,
+            'totalDonations': round(total_donations, 2),
+            'totalReferrals': totals['referrals'],
+            'averageDonation': round(total_donations / total_users, 2) if total_users > 0 else 0,
+            'departments': departments
+        }
+
+    def reconcile(self, load_users):
+        """Recount from `load_users()`, replace the running totals and report any drift
+
+        Writes applied while the users load are replayed over the recount:
+        each written user's scanned contribution is swapped for their state
+        after the write, whether or not the scan already saw it.
+        """
+        with self._lock:
+            self._journal = {}
+        try:
+            users = load_users()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+
+        expected = _compute([])
+        scanned = {}
+        for user in users:
+            _add(expected, user, 1)
+            if user.get('email'):
+                scanned[user['email']] = user
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            for email, after in journal.items():
+                if email in scanned:
+                    _add(expected, scanned[email], -1)
+                if after is not None:
+                    _add(expected, after, 1)
+
+            diffs = _differences(self._totals, expected) if self.ready else []
+            self._totals = expected
+            self.ready = True
+            self.last_reconciliation = {
+                'timestamp': datetime.now().isoformat(),
+                'discrepancies': diffs
+            }
+        return self.last_reconciliation
@@ -0,0 +1,719 @@
+"""
+Asyncio (ASGI) serving mode for the API
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+The per-request read and write routes run on the event loop against an
+AsyncUserStore, so a process keeps many Firestore round trips in flight
+instead of blocking one thread per request. Every other route (imports,
+exports, bulk updates, metrics, profiles) is forwarded to the Flask app in
+a thread pool. Both modes share the caches, read models, encoded response
+bodies and per-user donation locks in app.py and return the same JSON.
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_accept_header, parse_etags
+
+import app as sync_app
+from async_storage import (
+    AsyncFallbackUserStore, AsyncFirestoreUserStore, AsyncMemoryUserStore, AsyncReplicatedUserStore,
+    AsyncThreadedUserStore, AsyncTimedUserStore
+)
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from compression import compress, negotiate_encoding, stream_compressor
+from leaderboard import PUBLIC_USER_FIELDS, public_user
+from storage import FirestoreUserStore, MemoryUserStore, donations_of, project
+
+# Threads available to the forwarded Flask routes
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16'))
+
+
+def create_async_firestore_client():
+    """Async Firestore client for the same project as app.db"""
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import firestore as cloud_firestore
+        return cloud_firestore.AsyncClient(
+            project=os.getenv('FIREBASE_PROJECT_ID') or 'demo-she-can-foundation',
+            credentials=AnonymousCredentials()
+        )
+    from firebase_admin import firestore_async
+    return firestore_async.client()
+
+
+def create_async_user_store():
+    """Build the async counterpart of app.user_store"""
+    if sync_app.STORAGE_BACKEND == 'firestore' and sync_app.firebase_initialized and sync_app.db:
+        firestore_store = AsyncFirestoreUserStore(
+            create_async_firestore_client(),
+            legacy_lookup=sync_app.LEGACY_USER_LOOKUP,
+            timeout=sync_app.FIRESTORE_TIMEOUT
+        )
+        # Serve reads from the same replica as the Flask routes
+        if sync_app.firestore_replica is not None:
+            firestore_store = AsyncReplicatedUserStore(firestore_store, sync_app.firestore_replica)
+        # The probe runs in the breaker's own thread, so it uses the sync client
+        breaker = CircuitBreaker(
+            'firestore-async',
+            probe=FirestoreUserStore(sync_app.db, timeout=sync_app.FIRESTORE_TIMEOUT).ping,
+            failure_threshold=sync_app.CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=sync_app.CIRCUIT_RESET_TIMEOUT
+        )
+        fallback = AsyncMemoryUserStore(MemoryUserStore(sync_app.mock_users))
+        # Report to the same storage metrics as app.user_store; the other
+        # backends wrap app.user_store, which is already timed
+        return AsyncTimedUserStore(
+            AsyncFallbackUserStore(firestore_store, fallback, breaker=breaker),
+            sync_app.observe_storage_call
+        )
+    if sync_app.STORAGE_BACKEND in ('sqlite', 'shared'):
+        return AsyncThreadedUserStore(sync_app.user_store)
+    return AsyncMemoryUserStore(sync_app.user_store)
+
+
+user_store = create_async_user_store()
+
+# SQLite (and the shared store on top of it) answers the leaderboard and
+# stats with blocking queries
+BLOCKING_READ_MODELS = isinstance(user_store, AsyncThreadedUserStore)
+
+
+
+# Backoff between attempts to take a donation lock held elsewhere, in seconds
+DONATION_LOCK_POLL_MIN = 0.0005
+DONATION_LOCK_POLL_MAX = 0.02
+
+
+@asynccontextmanager
+async def donation_lock(email):
+    """Hold app.donation_locks' lock for `email` without blocking the event loop
+
+    The Flask routes forwarded to the thread pool (bulk updates) take the
+    same thread locks, so their writes never interleave with these. A
+    waiter polls instead of parking a thread on the lock: the holder may
+    need a thread from the same default executor (blocking stores,
+    compression) before it can release.
+    """
+    lock = sync_app.donation_locks.for_key(email)
+    delay = DONATION_LOCK_POLL_MIN
+    while not lock.acquire(blocking=False):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, DONATION_LOCK_POLL_MAX)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+async def read_model_call(func, *args):
+    """Call a leaderboard or stats method without blocking the event loop"""
+    if BLOCKING_READ_MODELS:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+async def ensure_leaderboard_index():
+    """Build the shared leaderboard index on first use"""
+    index = sync_app.leaderboard_index
+    if not index.ready:
+        started = time.perf_counter()
+        index.rebuild(await user_store.list_users(sync_app.LEADERBOARD_FIELDS))
+        sync_app.rebuild_latency.observe(time.perf_counter() - started, model='leaderboard')
+    return index
+
+
+async def ensure_stats_aggregator():
+    """Build the shared stats totals on first use"""
+    aggregator = sync_app.stats_aggregator
+    if not aggregator.ready:
+        started = time.perf_counter()
+        aggregator.rebuild(await user_store.list_users(sync_app.STATS_FIELDS))
+        sync_app.rebuild_latency.observe(time.perf_counter() - started, model='stats')
+    return aggregator
+
+
+async def get_user_by_email(email):
+    """Get user data by email, served from the shared user cache when possible"""
+    user = sync_app.user_cache.get(email)
+    if user is not None:
+        return user
+
+    user = await user_store.get_user(email)
+    if user is not None:
+        sync_app.user_cache.put(user)
+    return user
+
+
+async def get_users_by_email(emails):
+    """Get many users at once; returns a dict of email -> user or None"""
+    users = {}
+    missing = []
+    for email in dict.fromkeys(emails):
+        user = sync_app.user_cache.get(email)
+        if user is not None:
+            users[email] = user
+        else:
+            missing.append(email)
+
+    if missing:
+        for email, user in (await user_store.get_users(missing)).items():
+            users[email] = user
+            if user is not None:
+                sync_app.user_cache.put(user)
+    return users
+
+
+def int_arg(request, name, default=None):
+    """Read an integer query parameter like Flask's request.args.get(type=int)"""
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def parse_fields(request, allowed):
+    """Read a ?fields=a,b sparse fieldset; None when the parameter is absent"""
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def full_path(request):
+    """Path and query string, formatted like Flask's request.full_path"""
+    return f"{request.url.path}?{request.url.query}"
+
+
+def with_etag(response, etag):
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def not_modified(request, etag):
+    """Return a 304 response if If-None-Match matches `etag` or an encoded variant of it"""
+    if_none_match = parse_etags(request.headers.get('if-none-match'))
+    for candidate in [etag] + [f'{etag}-{encoding}' for encoding in ('gzip', 'br')]:
+        if if_none_match.contains_weak(candidate):
+            return with_etag(Response(status_code=304, headers={'Vary': 'Accept-Encoding'}), candidate)
+    return None
+
+
+def accepted_encoding(request):
+    """Content coding negotiated from the request's Accept-Encoding, or None"""
+    return negotiate_encoding(parse_accept_header(request.headers.get('accept-encoding')))
+
+
+def encoded_response(body, encoding, status_code=200):
+    """A JSON response whose body is already encoded with `encoding` (None for identity)"""
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return Response(body, status_code=status_code, media_type='application/json', headers=headers)
+
+
+async def versioned_json(request, etag, build):
+    """JSON response for one data version, built and compressed only on a cache miss
+
+    Like app.versioned_json with app.compress_response, each content
+    coding is a separate representation with an `-<encoding>` ETag.
+    """
+    key = (full_path(request), etag)
+    encoding = accepted_encoding(request)
+    if encoding is not None:
+        encoded = sync_app.response_cache.get(key, encoding)
+        if encoded is not None:
+            return with_etag(encoded_response(encoded, encoding), f'{etag}-{encoding}')
+
+    body = sync_app.response_cache.get(key, 'identity')
+    if body is None:
+        body = json.dumps(await build()).encode('utf-8')
+        sync_app.response_cache.put(key, 'identity', body)
+    if encoding is None or len(body) < sync_app.COMPRESSION_MIN_SIZE:
+        return with_etag(encoded_response(body, None), etag)
+
+    encoded = await asyncio.to_thread(compress, body, encoding)
+    sync_app.response_cache.put(key, encoding, encoded)
+    return with_etag(encoded_response(encoded, encoding), f'{etag}-{encoding}')
+
+
+async def json_response(request, payload, status_code=200):
+    """JSON response compressed for clients that accept it when large enough"""
+    body = json.dumps(payload).encode('utf-8')
+    encoding = accepted_encoding(request)
+    if encoding is None or len(body) < sync_app.COMPRESSION_MIN_SIZE:
+        return encoded_response(body, None, status_code)
+    return encoded_response(await asyncio.to_thread(compress, body, encoding), encoding, status_code)
+
+
+def error(message, status_code):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+async def health_check(request):
+    """Health check endpoint"""
+    calls, seconds = sync_app.storage_latency.totals()
+    last = sync_app.last_storage_call
+    breaker = getattr(user_store, 'breaker', None)
+    return JSONResponse({
+        'status': 'healthy',
+        'serving_mode': 'asgi',
+        'firebase_connected': sync_app.firebase_initialized,
+        'storage_backend': user_store.name,
+        'in_fallback': getattr(user_store, 'in_fallback', False),
+        'backend_latency': {
+            'calls': calls,
+            'avg_ms': round(1000 * seconds / calls, 3) if calls else None,
+            'last_operation': last['operation'],
+            'last_ms': round(1000 * last['seconds'], 3) if last['seconds'] is not None else None
+        },
+        'circuit': breaker.stats() if breaker else None,
+        'replica': sync_app.firestore_replica.stats() if sync_app.firestore_replica else None,
+        'user_cache': sync_app.user_cache.stats(),
+        'response_cache': sync_app.response_cache.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+async def signin(request):
+    """Sign in endpoint"""
+    try:
+        data = await request.json()
+        email = data.get('email')
+        password = data.get('password')
+
+        if not email or not password:
+            return error('Email and password are required', 400)
+
+        user = await get_user_by_email(email)
+
+        if not user:
+            return error('User not found', 404)
+
+        # In a real app, you'd hash and compare passwords
+        if user.get('password') != password:
+            return error('Invalid credentials', 401)
+
+        return JSONResponse({
+            'message': 'Sign in successful',
+            'user': public_user(user)
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def signup(request):
+    """Sign up endpoint"""
+    try:
+        data = await request.json()
+        email = data.get('email')
+        password = data.get('password')
+        first_name = data.get('firstName')
+        last_name = data.get('lastName')
+
+        if not all([email, password, first_name, last_name]):
+            return error('All fields are required', 400)
+
+        if await get_user_by_email(email):
+            return error('User already exists', 409)
+
+        new_user = {
+            'email': email,
+            'password': password,  # In real app, hash this
+            'firstName': first_name,
+            'lastName': last_name,
+            'donationsRaised': 0.0,
+            'referralCode': f"{first_name.lower()}{last_name.lower()}2025",
+            'createdAt': datetime.now().isoformat()
+        }
+
+        if not await user_store.create_user(new_user):
+            return error('Failed to create user', 500)
+
+        sync_app.record_user_write(None, new_user)
+        return JSONResponse({
+            'message': 'User created successfully',
+            'user': public_user(new_user)
+        }, status_code=201)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_user_donations(request):
+    """Get user donations"""
+    try:
+        email = request.path_params['email']
+        user = await get_user_by_email(email)
+
+        if not user:
+            return error('User not found', 404)
+
+        return JSONResponse({
+            'donationsRaised': user.get('donationsRaised', 0.0),
+            'referralCode': user.get('referralCode', ''),
+            'email': email
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def update_donations(request):
+    """Update user donations"""
+    try:
+        email = request.path_params['email']
+        data = await request.json()
+        amount = data.get('amount')
+
+        if amount is None:
+            return error('Amount is required', 400)
+        try:
+            amount = sync_app.parse_amount(amount)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        async with donation_lock(email):
+            before = await user_store.set_donations(email, amount)
+            if before is None:
+                return error('Failed to update donations', 500)
+            sync_app.record_user_write(before, {**before, 'donationsRaised': amount})
+
+        return JSONResponse({
+            'message': 'Donations updated successfully',
+            'donationsRaised': amount
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def increment_donations(request):
+    """Add an amount to a user's donations without overwriting concurrent updates"""
+    try:
+        email = request.path_params['email']
+        data = await request.json()
+        amount = data.get('amount')
+
+        if amount is None:
+            return error('Amount is required', 400)
+        try:
+            amount = sync_app.parse_amount(amount)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        async with donation_lock(email):
+            before = await user_store.increment_donations(email, amount)
+            if before is None:
+                return error('User not found', 404)
+            replica = sync_app.firestore_replica
+            if not before and replica is not None and replica.healthy:
+                # Blind Firestore Increment: the replica's listener event
+                # carries the new total to the read models
+                total = replica.donations_after(email, amount, getattr(before, 'update_time', None))
+            else:
+                if not before:
+                    # Blind Firestore Increment: apply it to the cached copy,
+                    # or read the user back and take the increment off again
+                    before = sync_app.user_cache.get(email)
+                    if before is None:
+                        user = await user_store.get_user(email) or {'email': email}
+                        before = {**user, 'donationsRaised': donations_of(user) - amount}
+                total = donations_of(before) + amount
+                sync_app.record_user_write(before, {**before, 'donationsRaised': total})
+
+        return JSONResponse({
+            'message': 'Donations incremented successfully',
+            'donationsRaised': round(total, 2),
+            'increment': amount
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_batch_donations(request):
+    """Get donations for many users at once, in request order"""
+    try:
+        data = await request.json()
+        emails = data.get('emails') if isinstance(data, dict) else None
+
+        if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+            return error('emails must be a list of strings', 400)
+
+        if len(emails) > sync_app.MAX_BATCH_EMAILS:
+            return error(f'At most {sync_app.MAX_BATCH_EMAILS} emails per request', 400)
+
+        users = await get_users_by_email(emails)
+        results = []
+        for email in emails:
+            user = users.get(email)
+            if user is None:
+                results.append({'email': email, 'found': False})
+            else:
+                results.append({
+                    'email': email,
+                    'found': True,
+                    'donationsRaised': user.get('donationsRaised', 0.0),
+                    'referralCode': user.get('referralCode', '')
+                })
+
+        return await json_response(request, {'results': results})
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def compressed_stream(chunks, encoding):
+    """Compress an async stream of str chunks as it is sent"""
+    process, finish = stream_compressor(encoding)
+    async for chunk in chunks:
+        data = process(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield finish()
+
+
+async def stream_users_response(request, fields):
+    """Stream {"users": [...]} one store page at a time"""
+    # Fetch the first page before the response starts so a failing
+    # backend still produces an error status
+    first_page, after = await user_store.page_users(sync_app.STREAM_PAGE_SIZE, None, fields)
+
+    async def generate():
+        nonlocal after
+        yield '{"users": ['
+        separator = ''
+        page = first_page
+        while True:
+            for user in page:
+                yield separator + json.dumps(public_user(user))
+                separator = ','
+            if after is None:
+                break
+            page, after = await user_store.page_users(sync_app.STREAM_PAGE_SIZE, after, fields)
+        yield ']}'
+
+    encoding = accepted_encoding(request)
+    if encoding is None:
+        return StreamingResponse(generate(), media_type='application/json', headers={'Vary': 'Accept-Encoding'})
+    return StreamingResponse(compressed_stream(generate(), encoding), media_type='application/json', headers={
+        'Content-Encoding': encoding,
+        'Vary': 'Accept-Encoding'
+    })
+
+
+async def get_all_users(request):
+    """Get all users, one page of users, or a streamed list (see app.get_all_users)"""
+    try:
+        limit = int_arg(request, 'limit')
+        cursor = request.query_params.get('cursor')
+
+        try:
+            fields = parse_fields(request, PUBLIC_USER_FIELDS)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        if request.query_params.get('stream', 'false').lower() == 'true':
+            return await stream_users_response(request, fields)
+
+        if limit is None and cursor is None:
+            users = [public_user(user) for user in await user_store.list_users(fields)]
+            return await json_response(request, {'users': users})
+
+        if limit is None:
+            limit = sync_app.DEFAULT_PAGE_SIZE
+        if limit < 1 or limit > sync_app.MAX_PAGE_SIZE:
+            return error(f'limit must be between 1 and {sync_app.MAX_PAGE_SIZE}', 400)
+
+        try:
+            after = sync_app.decode_cursor(cursor)
+        except ValueError:
+            return error('Invalid cursor', 400)
+
+        page, next_key = await user_store.page_users(limit, after, fields)
+        return await json_response(request, {
+            'users': [public_user(user) for user in page],
+            'nextCursor': sync_app.encode_cursor(next_key)
+        })
+
+    except CircuitOpenError as e:
+        return error(str(e), 503)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_leaderboard(request):
+    """Get leaderboard data sorted by donations raised"""
+    try:
+        limit = int_arg(request, 'limit')
+        offset = int_arg(request, 'offset', 0)
+
+        if offset < 0 or (limit is not None and limit < 0):
+            return error('limit and offset must be non-negative integers', 400)
+
+        try:
+            fields = parse_fields(request, sync_app.LEADERBOARD_QUERY_FIELDS)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        etag = sync_app.data_etag('leaderboard')
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+        async def build():
+            index = await ensure_leaderboard_index()
+            page = await read_model_call(index.page, offset, limit)
+            return {
+                'leaderboard': [project(entry, fields) for entry in page],
+                'total': await read_model_call(len, index),
+                'offset': offset,
+                'limit': limit
+            }
+
+        return await versioned_json(request, etag, build)
+
+    except CircuitOpenError as e:
+        return error(str(e), 503)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_leaderboard_rank(request):
+    """Get a user's rank, percentile and the entries ranked around them"""
+    try:
+        email = request.path_params['email']
+        window = int_arg(request, 'window', 5)
+
+        if window < 0 or window > sync_app.MAX_RANK_WINDOW:
+            return error(f'window must be between 0 and {sync_app.MAX_RANK_WINDOW}', 400)
+
+        index = await ensure_leaderboard_index()
+        rank, neighbors = await read_model_call(index.around, email, window)
+
+        if rank is None:
+            return error('User not found', 404)
+
+        total = await read_model_call(len, index)
+        percentile = 100.0 if total == 1 else round(100 * (total - rank) / (total - 1), 2)
+
+        return await json_response(request, {
+            'email': email,
+            'rank': rank,
+            'total': total,
+            'percentile': percentile,
+            'neighbors': neighbors
+        })
+
+    except CircuitOpenError as e:
+        return error(str(e), 503)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_stats(request):
+    """Get overall statistics"""
+    try:
+        etag = sync_app.data_etag('stats')
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+        async def build():
+            aggregator = await ensure_stats_aggregator()
+            return await read_model_call(aggregator.snapshot)
+
+        return await versioned_json(request, etag, build)
+
+    except CircuitOpenError as e:
+        return error(str(e), 503)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+def catalog_response(request, name):
+    """Serve a catalog straight from its pre-serialized, pre-compressed bytes"""
+    catalog = sync_app.catalog_file.get(name)
+    if catalog is None:
+        return error(f'{name} catalog is not available', 500)
+
+    etag = f'{name}-{catalog.digest}'
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    # Each content coding is a separate representation with its own ETag
+    encoding = negotiate_encoding(parse_accept_header(request.headers.get('accept-encoding')))
+    if encoding is None:
+        return with_etag(Response(catalog.body, media_type='application/json', headers={'Vary': 'Accept-Encoding'}), etag)
+    return with_etag(Response(catalog.encoded[encoding], media_type='application/json', headers={
+        'Content-Encoding': encoding,
+        'Vary': 'Accept-Encoding'
+    }), f'{etag}-{encoding}')
+
+
+async def get_rewards(request):
+    """Get rewards/achievements data"""
+    try:
+        return catalog_response(request, 'rewards')
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_recent_activities(request):
+    """Get recent activities/donations"""
+    try:
+        return catalog_response(request, 'activities')
+    except Exception as e:
+        return error(str(e), 500)
+
+
+routes = [
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/api/auth/signin', signin, methods=['POST']),
+    Route('/api/auth/signup', signup, methods=['POST']),
+    Route('/api/user/donations/batch', get_batch_donations, methods=['POST']),
+    Route('/api/user/donations/{email}', get_user_donations, methods=['GET']),
+    Route('/api/user/donations/{email}', update_donations, methods=['PUT']),
+    Route('/api/user/donations/{email}/increment', increment_donations, methods=['POST']),
+    Route('/api/users', get_all_users, methods=['GET']),
+    Route('/api/leaderboard', get_leaderboard, methods=['GET']),
+    Route('/api/leaderboard/rank/{email}', get_leaderboard_rank, methods=['GET']),
+    Route('/api/stats', get_stats, methods=['GET']),
+    Route('/api/rewards', get_rewards, methods=['GET']),
+    Route('/api/recent-activities', get_recent_activities, methods=['GET']),
+    # Everything else is served by the Flask app in a thread pool
+    Mount('/', app=WSGIMiddleware(sync_app.app, workers=WSGI_THREADS)),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=[os.getenv('FRONTEND_URL', 'http://localhost:5173')],
+                   allow_methods=['*'], allow_headers=['*']),
+    ]
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,337 @@
+"""
+Asyncio user storage backends used by the ASGI serving mode
+"""
+
+import asyncio
+import time
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from storage import MAX_BATCH_WRITES, MAX_IN_VALUES, BlindWrite, project
+from user_keys import user_doc_id
+
+
+class AsyncUserStore:
+    """Coroutine version of storage.UserStore for the routes served by asgi_app
+
+    Write methods return the user document as it was before the write (or
+    None if the user does not exist), exactly like the sync stores.
+    """
+
+    name = 'base'
+
+    async def get_user(self, email):
+        raise NotImplementedError
+
+    async def get_users(self, emails):
+        return {email: await self.get_user(email) for email in emails}
+
+    async def create_user(self, user_data):
+        raise NotImplementedError
+
+    async def set_donations(self, email, amount):
+        raise NotImplementedError
+
+    async def increment_donations(self, email, delta):
+        raise NotImplementedError
+
+    async def list_users(self, fields=None):
+        raise NotImplementedError
+
+    async def page_users(self, limit, after=None, fields=None):
+        raise NotImplementedError
+
+
+class AsyncMemoryUserStore(AsyncUserStore):
+    """Async face of a sync in-memory store; calls never block, so they run inline
+
+    Sharing the sync store keeps the mock data and its per-email locks in
+    common with the Flask routes that asgi_app forwards.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.name = store.name
+
+    async def get_user(self, email):
+        return self.store.get_user(email)
+
+    async def get_users(self, emails):
+        return self.store.get_users(emails)
+
+    async def create_user(self, user_data):
+        return self.store.create_user(user_data)
+
+    async def set_donations(self, email, amount):
+        return self.store.set_donations(email, amount)
+
+    async def increment_donations(self, email, delta):
+        return self.store.increment_donations(email, delta)
+
+    async def list_users(self, fields=None):
+        return self.store.list_users(fields)
+
+    async def page_users(self, limit, after=None, fields=None):
+        return self.store.page_users(limit, after, fields)
+
+
+class AsyncThreadedUserStore(AsyncMemoryUserStore):
+    """Async face of a blocking sync store (SQLite); each call runs in a worker thread"""
+
+    async def get_user(self, email):
+        return await asyncio.to_thread(self.store.get_user, email)
+
+    async def get_users(self, emails):
+        return await asyncio.to_thread(self.store.get_users, emails)
+
+    async def create_user(self, user_data):
+        return await asyncio.to_thread(self.store.create_user, user_data)
+
+    async def set_donations(self, email, amount):
+        return await asyncio.to_thread(self.store.set_donations, email, amount)
+
+    async def increment_donations(self, email, delta):
+        return await asyncio.to_thread(self.store.increment_donations, email, delta)
+
+    async def list_users(self, fields=None):
+        return await asyncio.to_thread(self.store.list_users, fields)
+
+    async def page_users(self, limit, after=None, fields=None):
+        return await asyncio.to_thread(self.store.page_users, limit, after, fields)
+
+
+class AsyncFirestoreUserStore(AsyncUserStore):
+    """Users in the Firestore `users` collection through the async client"""
+
+    name = 'firestore'
+
+    def __init__(self, db, legacy_lookup=True, timeout=None):
+        self.db = db
+        self.users_ref = db.collection('users')
+        self.timeout = timeout
+        self.legacy_lookup = legacy_lookup
+
+    async def find_user_doc(self, email):
+        """Get a user's snapshot by its email-keyed document ID"""
+        doc = await self.users_ref.document(user_doc_id(email)).get(timeout=self.timeout)
+        if doc.exists:
+            return doc
+
+        if self.legacy_lookup:
+            async for doc in self.users_ref.where('email', '==', email).limit(1).stream(timeout=self.timeout):
+                return doc
+        return None
+
+    async def get_user(self, email):
+        doc = await self.find_user_doc(email)
+        return doc.to_dict() if doc else None
+
+    async def get_users(self, emails):
+        doc_ids = {user_doc_id(email): email for email in emails}
+        users = dict.fromkeys(emails)
+        for start in range(0, len(emails), MAX_BATCH_WRITES):
+            refs = [self.users_ref.document(user_doc_id(email)) for email in emails[start:start + MAX_BATCH_WRITES]]
+            async for doc in self.db.get_all(refs, timeout=self.timeout):
+                if doc.exists:
+                    users[doc_ids[doc.id]] = doc.to_dict()
+
+        if self.legacy_lookup:
+            missing = [email for email, user in users.items() if user is None]
+            for start in range(0, len(missing), MAX_IN_VALUES):
+                query = self.users_ref.where('email', 'in', missing[start:start + MAX_IN_VALUES])
+                async for doc in query.stream(timeout=self.timeout):
+                    email = doc.get('email')
+                    if email in users and users[email] is None:
+                        users[email] = doc.to_dict()
+        return users
+
+    async def create_user(self, user_data):
+        try:
+            await self.users_ref.document(user_doc_id(user_data['email'])).create(user_data, timeout=self.timeout)
+            return True
+        except AlreadyExists:
+            return False
+
+    async def set_donations(self, email, amount):
+        doc = await self.find_user_doc(email)
+        if doc is None:
+            return None
+        await doc.reference.update({'donationsRaised': amount}, timeout=self.timeout)
+        return doc.to_dict()
+
+    async def increment_donations(self, email, delta):
+        change = {'donationsRaised': firestore.Increment(delta)}
+        try:
+            result = await self.users_ref.document(user_doc_id(email)).update(change, timeout=self.timeout)
+            return BlindWrite(result.update_time)
+        except NotFound:
+            if not self.legacy_lookup:
+                return None
+
+        async for doc in self.users_ref.where('email', '==', email).limit(1).stream(timeout=self.timeout):
+            result = await doc.reference.update(change, timeout=self.timeout)
+            return BlindWrite(result.update_time)
+        return None
+
+    async def list_users(self, fields=None):
+        query = self.users_ref.select(fields) if fields else self.users_ref
+        return [doc.to_dict() async for doc in query.stream(timeout=self.timeout)]
+
+    async def page_users(self, limit, after=None, fields=None):
+        query = self.users_ref.order_by('__name__').limit(limit + 1)
+        if fields:
+            query = query.select(fields)
+        if after is not None:
+            query = query.start_after({'__name__': after})
+        docs = [doc async for doc in query.stream(timeout=self.timeout)]
+        page = docs[:limit]
+        return [doc.to_dict() for doc in page], (page[-1].id if len(docs) > limit else None)
+
+
+class AsyncFallbackUserStore(AsyncUserStore):
+    """Async counterpart of storage.FallbackUserStore
+
+    Single-user operations fall back to `fallback` when `primary` raises
+    or the circuit is open; collection reads go through the breaker only.
+    """
+
+    def __init__(self, primary, fallback, breaker=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker
+        self.name = primary.name
+
+    @property
+    def in_fallback(self):
+        return self.breaker is not None and self.breaker.state != self.breaker.CLOSED
+
+    async def _guarded(self, operation, *args):
+        if self.breaker is not None:
+            self.breaker.check()
+        try:
+            result = await getattr(self.primary, operation)(*args)
+        except Exception:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return result
+
+    async def _call(self, operation, *args):
+        if self.breaker is None or self.breaker.allow():
+            try:
+                return await self._guarded(operation, *args)
+            except Exception as e:
+                print(f"{self.primary.name} {operation} failed: {e}")
+        return await getattr(self.fallback, operation)(*args)
+
+    async def get_user(self, email):
+        return await self._call('get_user', email)
+
+    async def get_users(self, emails):
+        return await self._call('get_users', emails)
+
+    async def create_user(self, user_data):
+        return await self._call('create_user', user_data)
+
+    async def set_donations(self, email, amount):
+        return await self._call('set_donations', email, amount)
+
+    async def increment_donations(self, email, delta):
+        return await self._call('increment_donations', email, delta)
+
+    async def list_users(self, fields=None):
+        return await self._guarded('list_users', fields)
+
+    async def page_users(self, limit, after=None, fields=None):
+        return await self._guarded('page_users', limit, after, fields)
+
+
+class AsyncReplicatedUserStore(AsyncUserStore):
+    """Async counterpart of replica.ReplicatedUserStore
+
+    Reads come from the process's FirestoreReplica while it is healthy,
+    without a round trip; writes and pages go to `primary`.
+    """
+
+    def __init__(self, primary, replica):
+        self.primary = primary
+        self.replica = replica
+        self.name = primary.name
+
+    async def get_user(self, email):
+        if self.replica.healthy:
+            return self.replica.get(email)
+        return await self.primary.get_user(email)
+
+    async def get_users(self, emails):
+        if self.replica.healthy:
+            return {email: self.replica.get(email) for email in emails}
+        return await self.primary.get_users(emails)
+
+    async def create_user(self, user_data):
+        return await self.primary.create_user(user_data)
+
+    async def set_donations(self, email, amount):
+        return await self.primary.set_donations(email, amount)
+
+    async def increment_donations(self, email, delta):
+        return await self.primary.increment_donations(email, delta)
+
+    async def list_users(self, fields=None):
+        if self.replica.healthy:
+            return [project(user, fields) for user in self.replica.users()]
+        return await self.primary.list_users(fields)
+
+    async def page_users(self, limit, after=None, fields=None):
+        return await self.primary.page_users(limit, after, fields)
+
+
+class AsyncTimedUserStore(AsyncUserStore):
+    """Async counterpart of storage.TimedUserStore, reporting to the same `observe`"""
+
+    def __init__(self, store, observe):
+        self.store = store
+        self.observe = observe
+        self.name = store.name
+
+    @property
+    def breaker(self):
+        return getattr(self.store, 'breaker', None)
+
+    @property
+    def in_fallback(self):
+        return getattr(self.store, 'in_fallback', False)
+
+    async def _timed(self, operation, *args):
+        started = time.perf_counter()
+        try:
+            result = await getattr(self.store, operation)(*args)
+        except Exception:
+            self.observe(operation, time.perf_counter() - started, True)
+            raise
+        self.observe(operation, time.perf_counter() - started, False)
+        return result
+
+    async def get_user(self, email):
+        return await self._timed('get_user', email)
+
+    async def get_users(self, emails):
+        return await self._timed('get_users', emails)
+
+    async def create_user(self, user_data):
+        return await self._timed('create_user', user_data)
+
+    async def set_donations(self, email, amount):
+        return await self._timed('set_donations', email, amount)
+
+    async def increment_donations(self, email, delta):
+        return await self._timed('increment_donations', email, delta)
+
+    async def list_users(self, fields=None):
+        return await self._timed('list_users', fields)
+
+    async def page_users(self, limit, after=None, fields=None):
+        return await self._timed('page_users', limit, after, fields)
@@ -0,0 +1,419 @@
+"""
+Benchmark and load-test suite for the Flask API
+
+Drives every endpoint either in-process through the Flask test client or
+over real HTTP (the Flask app under a threaded server, or the ASGI app
+under uvicorn), with synthetic users preloaded into the in-memory store,
+and reports throughput and p50/p95/p99 latency per route.
+
+--backend-latency adds a fixed delay to every store read and write, to
+stand in for a Firestore round trip: a blocking sleep in the Flask app,
+an asyncio sleep in the ASGI app.
+
+Usage:
+    python benchmark.py                                  # 1k users, in-process
+    python benchmark.py --users 1000 100000 1000000 --concurrency 8
+    python benchmark.py --mode http                      # serve the app on a local port
+    python benchmark.py --mode http --url http://localhost:5000 --users 0
+    python benchmark.py --mode asgi --backend-latency 20 --concurrency 64
+    python benchmark.py --accept-encoding identity       # uncompressed responses
+    python benchmark.py --output run.json --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Benchmarks always run against the in-memory store, without the
+# background reconciliation passes competing for the GIL
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('STATS_RECONCILE_INTERVAL', '0')
+os.environ.setdefault('LEADERBOARD_RECONCILE_INTERVAL', '0')
+
+import requests
+
+import app as api
+from synthetic import generate_users, load_synthetic_users
+
+# Email of a fixture user that every dataset contains
+BENCH_EMAIL = 'john@example.com'
+
+# Signed-up emails are unique per run, so repeated runs against one server
+# (--url) keep creating users instead of hitting 409s
+SIGNUP_RUN = uuid.uuid4().hex[:8]
+signup_numbers = itertools.count()
+
+
+def signup_body():
+    return {
+        'email': f'bench.{SIGNUP_RUN}.{next(signup_numbers)}@example.org',
+        'password': 'password123',
+        'firstName': 'Bench',
+        'lastName': 'User'
+    }
+
+
+# (name, method, path, JSON body); a callable body is called per request,
+# the uppercase placeholders are filled in per dataset by run_suite
+ROUTES = [
+    ('health', 'GET', '/api/health', None),
+    ('signin', 'POST', '/api/auth/signin', {'email': BENCH_EMAIL, 'password': 'password123'}),
+    ('get_donations', 'GET', f'/api/user/donations/{BENCH_EMAIL}', None),
+    ('update_donations', 'PUT', f'/api/user/donations/{BENCH_EMAIL}', {'amount': 2450.75}),
+    ('increment_donations', 'POST', f'/api/user/donations/{BENCH_EMAIL}/increment', {'amount': 1}),
+    ('batch_donations', 'POST', '/api/user/donations/batch', 'BATCH_EMAILS'),
+    ('bulk_donations', 'POST', '/api/user/donations/bulk', 'BULK_UPDATES'),
+    ('users_page', 'GET', '/api/users?limit=100', None),
+    ('users_all', 'GET', '/api/users', None),
+    ('leaderboard', 'GET', '/api/leaderboard', None),
+    ('leaderboard_top', 'GET', '/api/leaderboard?limit=10', None),
+    ('leaderboard_rank', 'GET', f'/api/leaderboard/rank/{BENCH_EMAIL}?window=5', None),
+    ('stats', 'GET', '/api/stats', None),
+    ('export_users', 'GET', '/api/export/users?format=ndjson', None),
+    ('export_leaderboard', 'GET', '/api/export/leaderboard?format=csv', None),
+    ('rewards', 'GET', '/api/rewards', None),
+    ('recent_activities', 'GET', '/api/recent-activities', None),
+    # Last, since every request adds a user to the dataset
+    ('signup', 'POST', '/api/auth/signup', signup_body),
+]
+
+# Routes whose payload grows with the user count; they are sampled less
+# on large datasets so a run finishes in reasonable time
+FULL_LIST_ROUTES = {'leaderboard', 'users_all', 'export_users', 'export_leaderboard'}
+
+# Accept-Encoding sent with every request, as a browser would
+DEFAULT_ACCEPT_ENCODING = 'gzip, deflate, br'
+
+# Relative p95 growth reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.20
+
+# Store calls delayed by --backend-latency; bulk loads are left alone so
+# preloading stays fast
+DELAYED_OPERATIONS = {
+    'get_user', 'get_users', 'create_user', 'set_donations', 'increment_donations', 'bulk_update_donations',
+    'list_users', 'page_users'
+}
+
+
+class DelayedUserStore:
+    """Sync store proxy that sleeps before each delayed operation"""
+
+    def __init__(self, store, seconds):
+        self.store = store
+        self.seconds = seconds
+
+    def __getattr__(self, name):
+        attr = getattr(self.store, name)
+        if name not in DELAYED_OPERATIONS:
+            return attr
+
+        def delayed(*args):
+            time.sleep(self.seconds)
+            return attr(*args)
+        return delayed
+
+
+class DelayedAsyncUserStore:
+    """Async store proxy that awaits a sleep before each delayed operation"""
+
+    def __init__(self, store, seconds):
+        self.store = store
+        self.seconds = seconds
+
+    def __getattr__(self, name):
+        attr = getattr(self.store, name)
+        if name not in DELAYED_OPERATIONS:
+            return attr
+
+        async def delayed(*args):
+            await asyncio.sleep(self.seconds)
+            return await attr(*args)
+        return delayed
+
+
+def simulate_backend_latency(mode, milliseconds):
+    """Delay the store calls made by the app under test"""
+    seconds = milliseconds / 1000
+    if mode == 'asgi':
+        import asgi_app
+        asgi_app.user_store = DelayedAsyncUserStore(asgi_app.user_store, seconds)
+    else:
+        api.user_store.store = DelayedUserStore(api.user_store.store, seconds)
+
+
+def preload_users(count, seed):
+    """Replace the in-memory store with the fixtures plus `count` synthetic users"""
+    fixtures = {email: dict(user) for email, user in FIXTURE_USERS.items()}
+    api.mock_users.clear()
+    api.mock_users.update(fixtures)
+    if count:
+        load_synthetic_users(api.user_store, count, seed=seed, workers=4)
+
+    # Start every dataset with cold derived read models, as after a deploy
+    api.user_cache.clear()
+    api.leaderboard_index.rebuild(api.load_all_users())
+    api.stats_aggregator.rebuild(api.load_all_users())
+    api.bump_data_version()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed, response_bytes):
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput': round(count / elapsed, 1) if elapsed > 0 else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if count else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if count else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if count else None,
+        'max_ms': round(latencies[-1] * 1000, 3) if count else None,
+        'avg_bytes': round(response_bytes / count) if count else None,
+    }
+
+
+class InProcessClient:
+    """Flask test client, one per thread"""
+
+    def __init__(self, accept_encoding=DEFAULT_ACCEPT_ENCODING):
+        self.headers = {'Accept-Encoding': accept_encoding}
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = api.app.test_client()
+        response = client.open(path, method=method, json=body, headers=self.headers)
+        return response.status_code, len(response.data)
+
+
+class HttpClient:
+    """requests session per thread against a running server
+
+    Sizes are the bytes on the wire, before requests would decompress them.
+    """
+
+    def __init__(self, base_url, accept_encoding=DEFAULT_ACCEPT_ENCODING):
+        self.base_url = base_url.rstrip('/')
+        self.accept_encoding = accept_encoding
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers['Accept-Encoding'] = self.accept_encoding
+        response = session.request(method, self.base_url + path, json=body, timeout=60, stream=True)
+        return response.status_code, len(response.raw.read(decode_content=False))
+
+
+def run_route(client, method, path, body, total, concurrency):
+    """Send `total` requests with `concurrency` workers; returns a summary"""
+    latencies = []
+    lock = threading.Lock()
+    errors = [0]
+    response_bytes = [0]
+
+    def worker(count):
+        local_latencies = []
+        local_errors = 0
+        local_bytes = 0
+        for _ in range(count):
+            payload = body() if callable(body) else body
+            started = time.perf_counter()
+            try:
+                status, size = client.request(method, path, payload)
+            except Exception:
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - started)
+            local_bytes += size
+            if status >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+            response_bytes[0] += local_bytes
+
+    shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, [share for share in shares if share]))
+    elapsed = time.perf_counter() - started
+
+    return summarize(latencies, errors[0], elapsed, response_bytes[0])
+
+
+def start_http_server(port):
+    """Serve the app from a background thread and return its base URL"""
+    from werkzeug.serving import make_server
+
+    # Per-request access logs would dominate the measured latency
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', port, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown
+
+
+def start_asgi_server(port):
+    """Serve asgi_app under uvicorn from a background thread and return its base URL"""
+    import uvicorn
+
+    import asgi_app
+
+    server = uvicorn.Server(uvicorn.Config(asgi_app.app, host='127.0.0.1', port=port,
+                                           log_level='warning', access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+
+    def shutdown():
+        server.should_exit = True
+    return f'http://127.0.0.1:{bound_port}', shutdown
+
+
+def run_suite(client, dataset_size, requests_per_route, concurrency, routes, seed):
+    batch_emails = {'emails': [BENCH_EMAIL] + [user['email'] for user in generate_users(min(dataset_size, 49), seed=seed)]}
+
+    bulk_updates = {'updates': [{'email': email, 'delta': 1} for email in batch_emails['emails']]}
+
+    results = {}
+    for name, method, path, body in ROUTES:
+        if routes and name not in routes:
+            continue
+        if body == 'BATCH_EMAILS':
+            body = batch_emails
+        elif body == 'BULK_UPDATES':
+            body = bulk_updates
+
+        total = requests_per_route
+        if name in FULL_LIST_ROUTES and dataset_size > 10000:
+            total = max(concurrency, requests_per_route * 10000 // dataset_size)
+
+        # One untimed request warms lazy indexes and caches
+        client.request(method, path, body() if callable(body) else body)
+        results[name] = run_route(client, method, path, body, total, concurrency)
+        summary = results[name]
+        print(f"  {name:<20} {summary['throughput']:>10} req/s  "
+              f"p50 {summary['p50_ms']:>9} ms  p95 {summary['p95_ms']:>9} ms  "
+              f"p99 {summary['p99_ms']:>9} ms  errors {summary['errors']}")
+    return results
+
+
+def compare(current, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print per-route p95 changes against a previous run; returns the regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    print(f"\nComparison with {baseline_path}:")
+    for key in ('mode', 'concurrency', 'backend_latency_ms', 'accept_encoding'):
+        if baseline.get('meta', {}).get(key) != current['meta'][key]:
+            print(f"  Warning: baseline {key} {baseline.get('meta', {}).get(key)!r} differs from {current['meta'][key]!r}")
+    for dataset, routes in current['datasets'].items():
+        for name, summary in routes.items():
+            before = baseline.get('datasets', {}).get(dataset, {}).get(name)
+            if not before or not before.get('p95_ms') or not summary.get('p95_ms'):
+                continue
+            change = summary['p95_ms'] / before['p95_ms'] - 1
+            marker = ' REGRESSION' if change > threshold else ''
+            print(f"  [{dataset} users] {name:<20} p95 {before['p95_ms']} -> {summary['p95_ms']} ms ({change:+.0%}){marker}")
+            if marker:
+                regressions.append({'dataset': dataset, 'route': name, 'change': round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('inprocess', 'http', 'asgi'), default='inprocess')
+    parser.add_argument('--url', help='Benchmark an already running server instead of serving the app (http/asgi mode)')
+    parser.add_argument('--port', type=int, default=0,
+                        help='Port for the benchmark server in http/asgi mode (default: any free port)')
+    parser.add_argument('--backend-latency', type=float, default=0,
+                        help='Milliseconds added to every store call, to simulate a remote database')
+    parser.add_argument('--users', type=int, nargs='+', default=[1000], help='Synthetic dataset sizes to preload')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--routes', nargs='+', help='Only run these routes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--accept-encoding', default=DEFAULT_ACCEPT_ENCODING,
+                        help="Accept-Encoding sent with every request ('identity' for uncompressed responses)")
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Relative p95 growth treated as a regression')
+    args = parser.parse_args()
+
+    if args.backend_latency and not args.url:
+        simulate_backend_latency(args.mode, args.backend_latency)
+
+    shutdown = None
+    if args.mode == 'inprocess':
+        client = InProcessClient(args.accept_encoding)
+    elif args.url:
+        client = HttpClient(args.url, args.accept_encoding)
+    else:
+        start_server = start_asgi_server if args.mode == 'asgi' else start_http_server
+        base_url, shutdown = start_server(args.port)
+        client = HttpClient(base_url, args.accept_encoding)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'mode': args.mode,
+            'url': args.url,
+            'concurrency': args.concurrency,
+            'backend_latency_ms': args.backend_latency,
+            'accept_encoding': args.accept_encoding,
+            'requests_per_route': args.requests,
+            'seed': args.seed,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'datasets': {}
+    }
+
+    for size in args.users:
+        if not args.url:
+            print(f"Preloading {size} synthetic users...")
+            preload_users(size, args.seed)
+        print(f"Dataset: {size} users ({args.mode}, concurrency {args.concurrency})")
+        output['datasets'][str(size)] = run_suite(client, size, args.requests, args.concurrency, args.routes, args.seed)
+
+    if shutdown is not None:
+        shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(output, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} route(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+FIXTURE_USERS = {email: dict(user) for email, user in api.mock_users.items()}
+
+if __name__ == '__main__':
+    main()
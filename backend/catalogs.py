@@ -0,0 +1,77 @@
+"""
+Static catalogs loaded from a JSON data file and kept as ready-to-send bytes
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from compression import SUPPORTED_ENCODINGS, compress
+
+# A catalog response body, its compressed forms by content coding and
+# their shared content hash
+SerializedCatalog = namedtuple('SerializedCatalog', ['body', 'encoded', 'digest'])
+
+
+def serialize_catalog(name, items):
+    """Build the {"<name>": [...]} response body once, plain and in every supported coding"""
+    body = json.dumps({name: items}, separators=(',', ':'), sort_keys=True).encode('utf-8') + b'\n'
+    encoded = {encoding: compress(body, encoding) for encoding in SUPPORTED_ENCODINGS}
+    return SerializedCatalog(body, encoded, hashlib.sha256(body).hexdigest()[:16])
+
+
+class CatalogFile:
+    """Catalogs read from one JSON file of {name: [items]}, reloaded when it changes
+
+    The file is checked at most once every `check_interval` seconds. An
+    edit that fails to parse is reported and the previous catalogs stay
+    in service.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._catalogs = {}
+        self._signature = None
+        self._next_check = 0.0
+        self.reloads = 0
+        self._load()
+
+    def _stat_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        signature = self._stat_signature()
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f'{self.path} must contain an object of catalogs')
+
+        self._catalogs = {name: serialize_catalog(name, items) for name, items in data.items()}
+        self._signature = signature
+        self.reloads += 1
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            try:
+                if self._stat_signature() != self._signature:
+                    self._load()
+                    print(f"Reloaded catalogs from {self.path}")
+            except Exception as e:
+                print(f"Reloading catalogs from {self.path} failed, keeping the previous version: {e}")
+
+    def get(self, name):
+        """Return the SerializedCatalog for `name`, or None if the file has no such catalog"""
+        self._reload_if_changed()
+        return self._catalogs.get(name)
@@ -0,0 +1,105 @@
+"""
+Circuit breaker for calls to a remote backend
+"""
+
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend until a background probe succeeds
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    every call is rejected immediately. While open, a background thread
+    runs `probe` every `reset_timeout` seconds and closes the circuit as
+    soon as one probe succeeds, so no request has to pay for a probe.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, name, probe, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.rejected = 0
+
+    def allow(self):
+        """Return True if a call may go to the backend"""
+        if self.state == self.CLOSED:
+            return True
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def check(self):
+        """Raise CircuitOpenError if calls are currently being rejected"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.OPEN or self.consecutive_failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+        print(f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures")
+        threading.Thread(target=self._probe_until_closed, name=f'{self.name}-probe', daemon=True).start()
+
+    def call(self, func, *args, **kwargs):
+        """Run `func` through the breaker, recording its outcome"""
+        self.check()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def after_fork(self):
+        """Restart probing in a forked worker if the circuit was open in the parent"""
+        self._lock = threading.Lock()
+        if self.state == self.OPEN:
+            threading.Thread(target=self._probe_until_closed, name=f'{self.name}-probe', daemon=True).start()
+
+    def _probe_until_closed(self):
+        while True:
+            time.sleep(self.reset_timeout)
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"{self.name} probe failed, circuit stays open: {e}")
+                continue
+
+            with self._lock:
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+                self.opened_at = None
+            print(f"{self.name} probe succeeded, circuit closed")
+            return
+
+    def stats(self):
+        """Return the breaker state and counters"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'open_for': round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0,
+                'rejected': self.rejected
+            }
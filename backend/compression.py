@@ -0,0 +1,111 @@
+"""
+Negotiated gzip/brotli response compression and a cache of encoded bodies
+"""
+
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings we can produce, most preferred first when the client
+# weights them equally
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate_encoding(accept_encodings):
+    """Pick the content coding for a request's Accept-Encoding, or None for identity"""
+    best, best_quality = None, 0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    """Compress a whole body with `encoding`"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps identical bodies byte-identical across workers
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def stream_compressor(encoding):
+    """Return (process, finish) functions of an incremental compressor"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def compress_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk without buffering all of it"""
+    process, finish = stream_compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class EncodedBodyCache:
+    """LRU of response bodies per (key, encoding), bounded by total bytes
+
+    A key names one version of one response, such as a URL and its ETag,
+    so entries never need invalidating; stale versions age out.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, encoding):
+        with self._lock:
+            body = self._entries.get((key, encoding))
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, encoding))
+            self.hits += 1
+            return body
+
+    def put(self, key, encoding, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop((key, encoding), None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[(key, encoding)] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
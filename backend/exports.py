@@ -0,0 +1,49 @@
+"""
+Row serializers for streaming NDJSON and CSV exports
+"""
+
+import csv
+import io
+import json
+
+from leaderboard import PUBLIC_USER_FIELDS
+
+# Columns written to CSV exports, in order; other document fields are dropped
+USER_EXPORT_FIELDS = list(PUBLIC_USER_FIELDS)
+LEADERBOARD_EXPORT_FIELDS = ['rank'] + USER_EXPORT_FIELDS
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def ndjson_lines(rows):
+    """Yield one JSON document per line"""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def csv_lines(rows, fields):
+    """Yield a CSV header followed by one line per row"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return line
+
+    writer.writeheader()
+    yield flush()
+    for row in rows:
+        writer.writerow(row)
+        yield flush()
+
+
+def export_lines(rows, export_format, fields):
+    """Serialize rows lazily in the requested export format"""
+    if export_format == 'csv':
+        return csv_lines(rows, fields)
+    return ndjson_lines(rows)
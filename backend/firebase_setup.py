@@ -1,18 +1,38 @@
 """
 Firebase setup script for initializing dummy data
 Run this script to populate Firebase with initial user data
+
+Usage:
+    python firebase_setup.py                  # populate dummy users
+    python firebase_setup.py migrate          # rekey users by email (resumable)
+    python firebase_setup.py migrate --restart
+    python firebase_setup.py import interns.csv [--sqlite users.db]
+    python firebase_setup.py generate 1000000 --seed 42 [--sqlite users.db]
+
+Set FIRESTORE_EMULATOR_HOST to run against a local Firestore emulator.
 """
 
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+import argparse
+import json
 import os
 from dotenv import load_dotenv
+from user_keys import user_doc_id
+from importer import IMPORT_FORMATS, import_users, iter_records
+from storage import FirestoreUserStore, SQLiteUserStore
+from synthetic import load_synthetic_users
 
 load_dotenv()
 
 def initialize_firebase():
     """Initialize Firebase with service account"""
     try:
+        if os.getenv('FIRESTORE_EMULATOR_HOST'):
+            # The emulator accepts any project ID and needs no credentials
+            return emulator_client()
+
         # For development, create a service account key file
         # In production, use proper service account credentials
         service_account_info = {
@@ -35,6 +55,16 @@ def initialize_firebase():
         print(f"Firebase initialization failed: {e}")
         return None
 
+def emulator_client():
+    """Firestore client for the local emulator named by FIRESTORE_EMULATOR_HOST"""
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore as cloud_firestore
+
+    return cloud_firestore.Client(
+        project=os.getenv('FIREBASE_PROJECT_ID') or 'demo-she-can-foundation',
+        credentials=AnonymousCredentials()
+    )
+
 def populate_dummy_data():
     """Populate Firebase with dummy user data"""
     db = initialize_firebase()
@@ -78,11 +108,10 @@ def populate_dummy_data():
         
         for user_data in dummy_users:
             # Check if user already exists
-            query = users_ref.where('email', '==', user_data['email']).limit(1)
-            existing = list(query.stream())
+            doc_ref = users_ref.document(user_doc_id(user_data['email']))
             
-            if not existing:
-                users_ref.add(user_data)
+            if not doc_ref.get().exists:
+                doc_ref.set(user_data)
                 print(f"Added user: {user_data['email']}")
             else:
                 print(f"User already exists: {user_data['email']}")
@@ -92,5 +121,232 @@ def populate_dummy_data():
     except Exception as e:
         print(f"Error populating data: {e}")
 
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+# Where the migration records the last document it processed, for resuming
+MIGRATION_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.migration_checkpoint.json')
+
+def load_checkpoint():
+    """Return the last migrated document ID and counters, if any"""
+    if not os.path.exists(MIGRATION_CHECKPOINT):
+        return {'last_id': None, 'scanned': 0, 'migrated': 0, 'skipped': 0}
+    with open(MIGRATION_CHECKPOINT) as f:
+        checkpoint = json.load(f)
+    checkpoint.setdefault('skipped', 0)
+    return checkpoint
+
+def save_checkpoint(checkpoint):
+    """Persist migration progress"""
+    with open(MIGRATION_CHECKPOINT, 'w') as f:
+        json.dump(checkpoint, f)
+
+def write_moves(db, moves):
+    """Create each target and delete its source, unless the source changed since it was read"""
+    batch = db.batch()
+    for doc, target, user_data in moves:
+        batch.create(target, user_data)
+        batch.delete(doc.reference, option=db.write_option(last_update_time=doc.update_time))
+    batch.commit()
+
+def commit_moves(db, moves):
+    """Commit (source, target, data) moves; returns how many were applied
+
+    A batch fails as a whole when a target appeared or a source was
+    written to during the run, so it is retried one move at a time and
+    only the moves that conflict are skipped.
+    """
+    if not moves:
+        return 0
+    try:
+        write_moves(db, moves)
+        return len(moves)
+    except (AlreadyExists, FailedPrecondition):
+        if len(moves) == 1:
+            doc, target, _ = moves[0]
+            print(f"Skipping {doc.id}: it changed or {target.id} was created during the migration")
+            return 0
+        return sum(commit_moves(db, [move]) for move in moves)
+
+def migrate_user_ids(batch_size=MAX_BATCH_WRITES, restart=False):
+    """Rewrite auto-ID user documents under email-keyed document IDs
+
+    Each moved user costs two writes (create new, delete old), so a batch
+    holds at most batch_size // 2 users. Targets that already exist are
+    never overwritten, and a source is only deleted if it has not changed
+    since it was read. Progress is checkpointed after every committed
+    batch so an interrupted run resumes where it stopped.
+    """
+    db = initialize_firebase()
+
+    if not db:
+        print("Could not initialize Firebase. Nothing to migrate.")
+        return
+
+    batch_size = max(2, min(batch_size, MAX_BATCH_WRITES))
+    users_per_batch = batch_size // 2
+
+    if restart and os.path.exists(MIGRATION_CHECKPOINT):
+        os.remove(MIGRATION_CHECKPOINT)
+    checkpoint = load_checkpoint()
+    if checkpoint['last_id']:
+        print(f"Resuming after document {checkpoint['last_id']} "
+              f"({checkpoint['scanned']} scanned, {checkpoint['migrated']} migrated)")
+
+    users_ref = db.collection('users')
+
+    try:
+        while True:
+            query = users_ref.order_by('__name__').limit(users_per_batch)
+            if checkpoint['last_id']:
+                query = query.start_after({'__name__': checkpoint['last_id']})
+            docs = list(query.stream())
+            if not docs:
+                break
+
+            moves = []
+            for doc in docs:
+                user_data = doc.to_dict()
+                email = user_data.get('email')
+                if not email:
+                    print(f"Skipping document without email: {doc.id}")
+                    continue
+
+                new_id = user_doc_id(email)
+                if doc.id == new_id:
+                    continue
+                moves.append((doc, users_ref.document(new_id), user_data))
+
+            # A user may already have an email-keyed document (e.g. signed
+            # up again); leave both for manual review instead of replacing it
+            existing = set()
+            if moves:
+                targets = [target for _, target, _ in moves]
+                existing = {snapshot.id for snapshot in db.get_all(targets) if snapshot.exists}
+            for doc, target, _ in moves:
+                if target.id in existing:
+                    print(f"Skipping {doc.id}: {target.id} already exists")
+            moves = [move for move in moves if move[1].id not in existing]
+            moved = commit_moves(db, moves)
+
+            checkpoint['last_id'] = docs[-1].id
+            checkpoint['scanned'] += len(docs)
+            checkpoint['migrated'] += moved
+            checkpoint['skipped'] += len(existing) + len(moves) - moved
+            save_checkpoint(checkpoint)
+            print(f"Scanned {checkpoint['scanned']} documents, migrated {checkpoint['migrated']}, "
+                  f"skipped {checkpoint['skipped']}")
+
+        print("User ID migration completed!")
+        os.remove(MIGRATION_CHECKPOINT)
+
+    except Exception as e:
+        print(f"Error migrating users: {e}")
+        print("Run the migration again to resume from the last checkpoint.")
+
+def import_users_file(path, import_format=None, sqlite_path=None):
+    """Stream a CSV or NDJSON file of users into Firestore or a SQLite database"""
+    if import_format is None:
+        import_format = 'ndjson' if path.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+    if sqlite_path:
+        store = SQLiteUserStore(sqlite_path)
+    else:
+        db = initialize_firebase()
+        if not db:
+            print("Could not initialize Firebase. Use --sqlite to import into a local database.")
+            return
+        store = FirestoreUserStore(db)
+
+    def progress(report):
+        print(f"{report['rows']} rows read, {report['imported']} imported, "
+              f"{report['duplicates']} duplicates, {report['failed']} failed "
+              f"({report['rowsPerSecond']} rows/s)")
+
+    try:
+        with open(path, encoding='utf-8', newline='') as f:
+            report = import_users(iter_records(f, import_format), store, on_batch=progress)
+    except Exception as e:
+        print(f"Error importing users: {e}")
+        return
+
+    for error in report['errors']:
+        print(f"Row {error['row']} ({error['email']}): {error['error']}")
+    progress(report)
+    print(f"Import completed in {report['seconds']}s")
+
+def generate_synthetic_users(count, seed=0, workers=8, batch_size=MAX_BATCH_WRITES, sqlite_path=None):
+    """Load `count` deterministic synthetic users into Firestore or a SQLite database"""
+    if sqlite_path:
+        store = SQLiteUserStore(sqlite_path)
+    else:
+        db = initialize_firebase()
+        if not db:
+            print("Could not initialize Firebase. Use --sqlite to generate into a local database.")
+            return
+        store = FirestoreUserStore(db, legacy_lookup=False)
+
+    last_report = [0.0]
+
+    def progress(done, total, seconds):
+        # Report roughly every two seconds rather than per batch
+        if seconds - last_report[0] >= 2 or done == total:
+            last_report[0] = seconds
+            print(f"{done}/{total} users written ({done / seconds:.0f} users/s)")
+
+    try:
+        report = load_synthetic_users(
+            store, count, seed=seed, batch_size=min(batch_size, MAX_BATCH_WRITES),
+            workers=workers, on_progress=progress
+        )
+    except Exception as e:
+        print(f"Error generating users: {e}")
+        return
+
+    print(f"Created {report['created']} users ({report['skipped']} already existed) "
+          f"in {report['seconds']}s ({report['rowsPerSecond']} users/s)")
+
+def main():
+    """Parse command line arguments and run the requested setup task"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('populate', help='Populate Firebase with dummy users (default)')
+
+    migrate_parser = subparsers.add_parser('migrate', help='Rekey user documents by email')
+    migrate_parser.add_argument('--batch-size', type=int, default=MAX_BATCH_WRITES,
+                                help='Writes per batch commit (max 500)')
+    migrate_parser.add_argument('--restart', action='store_true',
+                                help='Ignore any saved checkpoint and start from the beginning')
+
+    import_parser = subparsers.add_parser('import', help='Bulk import users from CSV or NDJSON')
+    import_parser.add_argument('path', help='File to import')
+    import_parser.add_argument('--format', choices=IMPORT_FORMATS,
+                               help='File format (default: from the file extension)')
+    import_parser.add_argument('--sqlite', metavar='PATH',
+                               help='Import into this SQLite database instead of Firestore')
+
+    generate_parser = subparsers.add_parser('generate', help='Load synthetic users for capacity testing')
+    generate_parser.add_argument('count', type=int, help='Number of users to generate')
+    generate_parser.add_argument('--seed', type=int, default=0, help='Seed; the same seed gives the same users')
+    generate_parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                                 help='Parallel writer threads')
+    generate_parser.add_argument('--batch-size', type=int, default=MAX_BATCH_WRITES,
+                                 help='Users per batched write (max 500)')
+    generate_parser.add_argument('--sqlite', metavar='PATH',
+                                 help='Generate into this SQLite database instead of Firestore')
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate_user_ids(batch_size=args.batch_size, restart=args.restart)
+    elif args.command == 'generate':
+        generate_synthetic_users(args.count, seed=args.seed, workers=args.workers,
+                                 batch_size=args.batch_size, sqlite_path=args.sqlite)
+    elif args.command == 'import':
+        import_users_file(args.path, import_format=args.format, sqlite_path=args.sqlite)
+    else:
+        populate_dummy_data()
+
 if __name__ == "__main__":
-    populate_dummy_data()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Streaming bulk import of users from CSV or NDJSON
+"""
+
+import csv
+import json
+import math
+import time
+from datetime import datetime
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Rows written per store batch
+IMPORT_BATCH_SIZE = 500
+
+# Per-row errors kept in the report; later errors are only counted
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_FIELDS = ('email', 'password', 'firstName', 'lastName')
+
+# Fields stored as text; NDJSON rows may carry any JSON type in them
+STRING_FIELDS = REQUIRED_FIELDS + ('referralCode', 'createdAt', 'department', 'joinDate')
+
+
+def iter_records(text_stream, import_format):
+    """Yield one dict per row without reading the whole file"""
+    if import_format == 'csv':
+        yield from csv.DictReader(text_stream)
+        return
+
+    for line in text_stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ValueError(f'Invalid JSON: {e.msg}')
+
+
+def build_user(record):
+    """Validate an import row and turn it into a user document"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError('Row must be an object')
+
+    missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    not_strings = [field for field in STRING_FIELDS if record.get(field) and not isinstance(record[field], str)]
+    if not_strings:
+        raise ValueError(f"Fields must be strings: {', '.join(not_strings)}")
+
+    try:
+        donations = float(record.get('donationsRaised') or 0)
+        referrals = int(record.get('totalReferrals') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('donationsRaised and totalReferrals must be numbers')
+    if not math.isfinite(donations):
+        raise ValueError('donationsRaised must be a finite number')
+
+    first_name = record['firstName']
+    last_name = record['lastName']
+    user = {
+        'email': record['email'].strip(),
+        'password': record['password'],
+        'firstName': first_name,
+        'lastName': last_name,
+        'donationsRaised': donations,
+        'referralCode': record.get('referralCode') or f"{first_name.lower()}{last_name.lower()}2025",
+        'createdAt': record.get('createdAt') or datetime.now().isoformat(),
+        'totalReferrals': referrals
+    }
+    for field in ('department', 'joinDate'):
+        if record.get(field):
+            user[field] = record[field]
+    return user
+
+
+def existing_emails(store, page_size=1000):
+    """Collect every stored email with one paged pass over the store"""
+    emails = set()
+    after = None
+    while True:
+        page, after = store.page_users(page_size, after, ['email'])
+        emails.update(user.get('email') for user in page)
+        if after is None:
+            return emails
+
+
+def import_users(records, store, on_created=None, on_batch=None, batch_size=IMPORT_BATCH_SIZE):
+    """Validate, dedupe and write users in batches; returns a report
+
+    `on_created(user)` is called for every stored user and
+    `on_batch(report)` after every committed batch.
+    """
+    started = time.monotonic()
+    seen = existing_emails(store)
+    report = {'rows': 0, 'imported': 0, 'duplicates': 0, 'failed': 0, 'errors': []}
+
+    def fail(row_number, email, error):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row_number, 'email': email, 'error': error})
+
+    def flush(batch):
+        created = store.create_users([user for _, user in batch])
+        for (row_number, user), ok in zip(batch, created):
+            if ok:
+                report['imported'] += 1
+                if on_created:
+                    on_created(user)
+            else:
+                fail(row_number, user['email'], 'User already exists')
+        if on_batch:
+            on_batch(finish(report, started))
+
+    batch = []
+    for row_number, record in enumerate(records, start=1):
+        report['rows'] += 1
+        try:
+            user = build_user(record)
+        except ValueError as e:
+            fail(row_number, record.get('email') if isinstance(record, dict) else None, str(e))
+            continue
+
+        if user['email'] in seen:
+            report['duplicates'] += 1
+            continue
+        seen.add(user['email'])
+
+        batch.append((row_number, user))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+    return finish(report, started)
+
+
+def finish(report, started):
+    """Add elapsed time and throughput to a report"""
+    seconds = time.monotonic() - started
+    report['seconds'] = round(seconds, 3)
+    report['rowsPerSecond'] = round(report['rows'] / seconds, 1) if seconds > 0 else None
+    return report
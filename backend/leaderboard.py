@@ -0,0 +1,164 @@
+"""
+Ranked leaderboard index kept up to date by the user write paths
+"""
+
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+
+# User document fields that may be returned to clients, in display order
+PUBLIC_USER_FIELDS = [
+    'email', 'firstName', 'lastName', 'department', 'donationsRaised',
+    'totalReferrals', 'referralCode', 'joinDate', 'createdAt'
+]
+
+
+def public_user(user):
+    """Return a copy of a user document without the password field"""
+    user_copy = dict(user)
+    user_copy.pop('password', None)
+    return user_copy
+
+
+def rank_key(user):
+    """Sort key for a user: highest donations first, ties broken by email"""
+    return (-float(user.get('donationsRaised', 0) or 0), user.get('email', ''))
+
+
+class LeaderboardIndex:
+    """Users kept sorted by donations raised so pages are a slice, not a sort"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._users = {}
+        # email -> entry (None for a removal) written while reconcile() loads users
+        self._journal = None
+        self.ready = False
+        self.last_reconciliation = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def rebuild(self, users):
+        """Replace the whole index from an iterable of user documents"""
+        users_by_email = {}
+        for user in users:
+            if user.get('email'):
+                users_by_email[user['email']] = public_user(user)
+        keys = sorted(rank_key(user) for user in users_by_email.values())
+
+        with self._lock:
+            self._users = users_by_email
+            self._keys = keys
+            self.ready = True
+
+    def upsert(self, user):
+        """Insert or reposition a single user"""
+        email = user.get('email')
+        if not email:
+            return
+
+        with self._lock:
+            self._discard(email)
+            entry = public_user(user)
+            self._users[email] = entry
+            insort(self._keys, rank_key(entry))
+            if self._journal is not None:
+                self._journal[email] = entry
+
+    def remove(self, email):
+        """Drop a user from the index"""
+        with self._lock:
+            self._discard(email)
+            if self._journal is not None:
+                self._journal[email] = None
+
+    def reconcile(self, load_users):
+        """Rebuild from `load_users()` and report the users whose rank data had drifted
+
+        Upserts and removals made while the users load are replayed over
+        the fresh copy, so a write racing the scan is never lost.
+        """
+        with self._lock:
+            self._journal = {}
+        try:
+            users = load_users()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+
+        fresh = {}
+        for user in users:
+            if user.get('email'):
+                fresh[user['email']] = public_user(user)
+        keys = sorted(rank_key(user) for user in fresh.values())
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            for email, entry in journal.items():
+                _discard_entry(fresh, keys, email)
+                if entry is not None:
+                    fresh[email] = entry
+                    insort(keys, rank_key(entry))
+
+            drifted = []
+            if self.ready:
+                for email in sorted(set(fresh) | set(self._users)):
+                    was, want = self._users.get(email), fresh.get(email)
+                    if (was and rank_key(was)) != (want and rank_key(want)):
+                        drifted.append(email)
+
+            self._users = fresh
+            self._keys = keys
+            self.ready = True
+            self.last_reconciliation = {
+                'timestamp': datetime.now().isoformat(),
+                'drifted': len(drifted),
+                'sample': drifted[:10]
+            }
+        return self.last_reconciliation
+
+    def page(self, offset=0, limit=None):
+        """Return ranked copies of the users in [offset, offset + limit)"""
+        with self._lock:
+            end = len(self._keys) if limit is None else offset + limit
+            keys = self._keys[offset:end]
+            entries = []
+            for position, key in enumerate(keys, start=offset + 1):
+                entry = dict(self._users[key[1]])
+                entry['rank'] = position
+                entries.append(entry)
+            return entries
+
+    def rank_of(self, email):
+        """Return the 1-based rank of a user, or None if not indexed"""
+        with self._lock:
+            entry = self._users.get(email)
+            if entry is None:
+                return None
+            return bisect_left(self._keys, rank_key(entry)) + 1
+
+    def around(self, email, window):
+        """Return (rank, entries) for a user and up to `window` users either side"""
+        with self._lock:
+            rank = self.rank_of(email)
+            if rank is None:
+                return None, []
+            offset = max(rank - 1 - window, 0)
+            return rank, self.page(offset, rank - offset + window)
+
+    def _discard(self, email):
+        _discard_entry(self._users, self._keys, email)
+
+
+def _discard_entry(users, keys, email):
+    """Remove a user from an email -> entry dict and its sorted rank keys"""
+    entry = users.pop(email, None)
+    if entry is None:
+        return
+    key = rank_key(entry)
+    position = bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
@@ -0,0 +1,48 @@
+"""
+Fine-grained locking helpers
+"""
+
+import threading
+
+
+class StripedLock:
+    """A fixed pool of locks selected by key, so unrelated keys rarely contend
+
+    `lock_factory` builds each stripe, e.g. asyncio.Lock for coroutines.
+    """
+
+    def __init__(self, stripes=64, lock_factory=threading.Lock):
+        self._locks = [lock_factory() for _ in range(stripes)]
+
+    def for_key(self, key):
+        """Return the lock guarding `key`"""
+        return self._locks[hash(key) % len(self._locks)]
+
+    def for_keys(self, keys):
+        """Return a context manager holding the locks of every key in `keys`
+
+        Stripes are acquired in index order, so two callers locking
+        overlapping sets cannot deadlock.
+        """
+        stripes = sorted({hash(key) % len(self._locks) for key in keys})
+        return _MultiLock([self._locks[stripe] for stripe in stripes])
+
+
+class _MultiLock:
+    """Acquire several locks in order and release them in reverse"""
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    def __enter__(self):
+        for index, lock in enumerate(self.locks):
+            try:
+                lock.acquire()
+            except BaseException:
+                for held in reversed(self.locks[:index]):
+                    held.release()
+                raise
+
+    def __exit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
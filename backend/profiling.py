@@ -0,0 +1,160 @@
+"""
+Opt-in per-request profiling written to a bounded spool directory
+"""
+
+import cProfile
+import hmac
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+# Request header that asks for a profile and authorizes the profile endpoints
+PROFILE_HEADER = 'X-Profile-Token'
+
+PROFILE_NAME = re.compile(r'^[0-9]{8}T[0-9]{9}-[0-9a-f]{6}\.prof$')
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the newest `max_profiles` on disk
+
+    A request is profiled when it carries `token` in the X-Profile-Token
+    header, or at random with probability `sample_rate`.
+    """
+
+    def __init__(self, spool_dir, max_profiles=100, sample_rate=0.0, token=None):
+        self.spool_dir = spool_dir
+        self.max_profiles = max_profiles
+        self.sample_rate = sample_rate
+        self.token = token
+        self._lock = threading.Lock()
+        self._index = {}
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def authorized(self, header_value):
+        """True if `header_value` matches the configured token"""
+        return bool(self.token and header_value) and hmac.compare_digest(header_value, self.token)
+
+    def should_profile(self, header_value):
+        if self.authorized(header_value):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def new_profile_id(self):
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')[:-3]
+        return f'{stamp}-{random.getrandbits(24):06x}'
+
+    def save(self, profile_id, profiler, method, path, status, seconds):
+        """Write a finished profile and drop the oldest beyond `max_profiles`"""
+        name = f'{profile_id}.prof'
+        profiler.dump_stats(os.path.join(self.spool_dir, name))
+        with self._lock:
+            self._index[name] = {
+                'method': method,
+                'path': path,
+                'status': status,
+                'seconds': round(seconds, 6)
+            }
+        self._prune()
+
+    def _prune(self):
+        names = sorted(self.profile_names())
+        for name in names[:max(len(names) - self.max_profiles, 0)]:
+            try:
+                os.remove(os.path.join(self.spool_dir, name))
+            except OSError:
+                pass
+            with self._lock:
+                self._index.pop(name, None)
+
+    def profile_names(self):
+        return [name for name in os.listdir(self.spool_dir) if PROFILE_NAME.match(name)]
+
+    def list_profiles(self):
+        """Return the spooled profiles, newest first"""
+        profiles = []
+        for name in sorted(self.profile_names(), reverse=True):
+            try:
+                size = os.path.getsize(os.path.join(self.spool_dir, name))
+            except OSError:
+                continue
+            with self._lock:
+                details = dict(self._index.get(name, {}))
+            profiles.append({'name': name, 'bytes': size, **details})
+        return profiles
+
+
+class ProfilingMiddleware:
+    """WSGI middleware that runs selected requests under cProfile
+
+    Streamed bodies are profiled chunk by chunk until the server closes
+    the response, so generators that do their work lazily are included.
+    """
+
+    def __init__(self, wsgi_app, profiler, excluded_prefix=None):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+        self.excluded_prefix = excluded_prefix
+
+    def __call__(self, environ, start_response):
+        if self.excluded_prefix and environ.get('PATH_INFO', '').startswith(self.excluded_prefix):
+            return self.wsgi_app(environ, start_response)
+        if not self.profiler.should_profile(environ.get('HTTP_X_PROFILE_TOKEN')):
+            return self.wsgi_app(environ, start_response)
+
+        profile_id = self.profiler.new_profile_id()
+        status = {}
+
+        def profiled_start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(' ', 1)[0])
+            return start_response(status_line, headers + [('X-Profile-Id', profile_id)], exc_info)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this interpreter
+            return self.wsgi_app(environ, start_response)
+        try:
+            body = self.wsgi_app(environ, profiled_start_response)
+        finally:
+            profiler.disable()
+
+        return ProfiledBody(body, profiler, lambda: self.profiler.save(
+            profile_id, profiler, environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'),
+            status.get('code'), time.perf_counter() - started
+        ))
+
+
+class ProfiledBody:
+    """Response iterable that keeps profiling while the body is produced"""
+
+    def __init__(self, body, profiler, on_close):
+        self.body = body
+        self.profiler = profiler
+        self.on_close = on_close
+
+    def __iter__(self):
+        iterator = iter(self.body)
+        while True:
+            self.profiler.enable()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.profiler.disable()
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            try:
+                self.on_close()
+            except Exception as e:
+                print(f"Saving request profile failed: {e}")
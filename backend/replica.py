@@ -0,0 +1,254 @@
+"""
+In-memory replica of the Firestore users collection kept current by a
+realtime snapshot listener
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from storage import UserStore, donations_of, project
+
+
+class FirestoreReplica:
+    """Local copy of every user document, updated by `on_snapshot` events
+
+    `on_change(before, after)` is called for every user document the
+    listener (or put()) changes, in order and under the replica lock, so
+    read models fed from it see each transition exactly once.
+    `on_resync()` is called after a (re)subscription has loaded the whole
+    collection, when individual changes may have been missed.
+    """
+
+    def __init__(self, users_ref, retry_interval=30.0, on_change=None, on_resync=None):
+        self.users_ref = users_ref
+        self.retry_interval = retry_interval
+        self.on_change = on_change
+        self.on_resync = on_resync
+        self._lock = threading.Lock()
+        self._users = {}
+        self._emails_by_id = {}
+        self._update_times = {}
+        # Held while (un)subscribing, so only one listener is ever live
+        self._subscribe_lock = threading.Lock()
+        self._watch = None
+        self._retry_thread = None
+        self._synced = False
+        self.last_read_time = None
+        self.last_event_at = None
+        self.lag_seconds = None
+        self.events = 0
+
+    def start(self):
+        """Subscribe to the collection; the first snapshot loads every document
+
+        Also starts the thread that resubscribes whenever the listener drops.
+        """
+        with self._subscribe_lock:
+            self._subscribe()
+            if self._retry_thread is None:
+                self._retry_thread = threading.Thread(
+                    target=self._run_retries, name='firestore-replica-retry', daemon=True
+                )
+                self._retry_thread.start()
+
+    def stop(self):
+        with self._subscribe_lock:
+            self._unsubscribe()
+
+    def after_fork(self):
+        """Subscribe in a forked worker; the pre-fork master never listens"""
+        self._lock = threading.Lock()
+        self._subscribe_lock = threading.Lock()
+        self._watch = None
+        self._retry_thread = None
+        self.start()
+
+    @property
+    def healthy(self):
+        """True once the initial snapshot has arrived and the listener is still connected"""
+        watch = self._watch
+        return watch is not None and watch.is_active and self._synced
+
+    def _subscribe(self):
+        self._unsubscribe()
+        with self._lock:
+            self._synced = False
+        self._watch = self.users_ref.on_snapshot(self._on_snapshot)
+
+    def _unsubscribe(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _run_retries(self):
+        """Resubscribe, at most once per retry interval, while the listener is down"""
+        while True:
+            time.sleep(self.retry_interval)
+            with self._subscribe_lock:
+                if self._watch is not None and self._watch.is_active:
+                    continue
+                try:
+                    self._subscribe()
+                except Exception as e:
+                    print(f"Firestore replica resubscribe failed: {e}")
+
+    def _on_snapshot(self, docs, changes, read_time):
+        resynced = False
+        with self._lock:
+            if not self._synced:
+                self._users = {}
+                self._emails_by_id = {}
+                self._update_times = {}
+                for doc in docs:
+                    self._store(doc)
+                self._synced = True
+                resynced = True
+            else:
+                for change in changes:
+                    if change.type.name == 'REMOVED':
+                        self._remove(change.document)
+                    else:
+                        self._store(change.document)
+
+            self.events += 1
+            self.last_read_time = read_time
+            self.last_event_at = time.time()
+            if read_time is not None:
+                self.lag_seconds = max((datetime.now(timezone.utc) - read_time).total_seconds(), 0.0)
+
+        if resynced and self.on_resync is not None:
+            try:
+                self.on_resync()
+            except Exception as e:
+                print(f"Firestore replica resync handler failed: {e}")
+
+    def _changed(self, before, after):
+        if before != after and self.on_change is not None and self._synced:
+            try:
+                self.on_change(before, after)
+            except Exception as e:
+                print(f"Firestore replica change handler failed: {e}")
+
+    def _store(self, doc):
+        user = doc.to_dict()
+        if not user or not user.get('email'):
+            return
+        previous = self._emails_by_id.get(doc.id)
+        if previous is not None and previous != user['email']:
+            self._update_times.pop(previous, None)
+            self._changed(self._users.pop(previous, None), None)
+        self._emails_by_id[doc.id] = user['email']
+        before = self._users.get(user['email'])
+        self._users[user['email']] = user
+        self._update_times[user['email']] = getattr(doc, 'update_time', None)
+        self._changed(before, user)
+
+    def _remove(self, doc):
+        email = self._emails_by_id.pop(doc.id, None)
+        if email is not None:
+            self._update_times.pop(email, None)
+            self._changed(self._users.pop(email, None), None)
+
+    def put(self, user):
+        """Apply a write made by this process ahead of its listener event
+
+        Returns False, and changes nothing, while the replica is not synced.
+        """
+        if user is None or not user.get('email'):
+            return False
+        with self._lock:
+            if not self._synced:
+                return False
+            before = self._users.get(user['email'])
+            self._users[user['email']] = dict(user)
+            self._changed(before, dict(user))
+        return True
+
+    def get(self, email):
+        with self._lock:
+            user = self._users.get(email)
+            return dict(user) if user is not None else None
+
+    def donations_after(self, email, delta, update_time):
+        """Donations of `email` counting a blind Increment of `delta` applied at `update_time`
+
+        The delta is only added while the local copy predates the write;
+        once the listener has delivered it, the copy already includes it.
+        """
+        with self._lock:
+            donations = donations_of(self._users.get(email) or {})
+            seen = self._update_times.get(email)
+            if update_time is not None and seen is not None and seen >= update_time:
+                return donations
+            return donations + delta
+
+    def users(self):
+        with self._lock:
+            return list(self._users.values())
+
+    def stats(self):
+        """Return document count, sync state and replication lag"""
+        with self._lock:
+            return {
+                'connected': self._watch is not None and self._watch.is_active,
+                'synced': self._synced,
+                'documents': len(self._users),
+                'events': self.events,
+                'lag_seconds': round(self.lag_seconds, 3) if self.lag_seconds is not None else None,
+                'last_event_age': round(time.time() - self.last_event_at, 1) if self.last_event_at else None
+            }
+
+
+class ReplicatedUserStore(UserStore):
+    """Serve reads from a FirestoreReplica and send writes to Firestore
+
+    Reads go straight to Firestore whenever the replica is not healthy.
+    """
+
+    def __init__(self, primary, replica):
+        self.primary = primary
+        self.replica = replica
+        self.name = primary.name
+
+    def get_user(self, email):
+        if self.replica.healthy:
+            return self.replica.get(email)
+        return self.primary.get_user(email)
+
+    def get_users(self, emails):
+        if self.replica.healthy:
+            return {email: self.replica.get(email) for email in emails}
+        return self.primary.get_users(emails)
+
+    def list_users(self, fields=None):
+        if self.replica.healthy:
+            return [project(user, fields) for user in self.replica.users()]
+        return self.primary.list_users(fields)
+
+    def page_users(self, limit, after=None, fields=None):
+        # Cursors are Firestore document IDs, so pages always come from
+        # Firestore to stay consistent if the replica drops mid-export
+        return self.primary.page_users(limit, after, fields)
+
+    def create_user(self, user_data):
+        return self.primary.create_user(user_data)
+
+    def create_users(self, users):
+        return self.primary.create_users(users)
+
+    def set_donations(self, email, amount):
+        return self.primary.set_donations(email, amount)
+
+    def increment_donations(self, email, delta):
+        return self.primary.increment_donations(email, delta)
+
+    def bulk_update_donations(self, ops_by_email):
+        return self.primary.bulk_update_donations(ops_by_email)
+
+    def after_fork(self):
+        self.primary.after_fork()
+        self.replica.after_fork()
+
+    def ping(self):
+        return self.primary.ping()
@@ -1,21 +1,163 @@
 """
-Development server runner
+Server runner
+
+    python run.py                 # Flask development server
+    python run.py --production    # pre-forking gunicorn server with warm caches
+    python run.py --reload        # replace a running production server's workers without dropping connections
 """
 
-from app import app
+import argparse
 import os
+import signal
+import sys
+import time
+
+# PID file of the production master, used by --reload
+PID_FILE = os.getenv('GUNICORN_PID_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.pid'))
+
+# Seconds workers get to finish in-flight requests on shutdown or reload
+GRACEFUL_TIMEOUT = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+
+# Seconds --reload gives the new workers to boot before retiring the old ones
+RELOAD_SETTLE_SECONDS = float(os.getenv('RELOAD_SETTLE_SECONDS', '5'))
+
+
+def cpu_count():
+    """Cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_settings(api):
+    """(workers, threads) from WEB_CONCURRENCY/GUNICORN_THREADS or the core count
+
+    The leaderboard index, stats totals, user cache and data version live
+    in each process. Several workers only agree when those are shared
+    (the SQLite-based backends keep the version in a shared file and
+    answer the leaderboard and stats from the database). Otherwise a
+    single worker runs more threads, since every worker would serve ETags
+    only it recognizes; with the Firestore replica each worker would also
+    see the listener's events at a different moment.
+    """
+    cores = cpu_count()
+    if api.shared_version is not None:
+        workers, threads = 2 * cores + 1, 4
+    else:
+        workers, threads = 1, max(4, 2 * cores)
+    return int(os.getenv('WEB_CONCURRENCY', workers)), int(os.getenv('GUNICORN_THREADS', threads))
+
+
+def run_development():
+    from app import app
 
-if __name__ == '__main__':
     # Run the Flask development server
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
-    
+
     print(f"Starting Flask server on port {port}")
     print(f"Debug mode: {debug}")
     print("Backend API will be available at: http://localhost:5000")
-    
+
     app.run(
         host='0.0.0.0',
         port=port,
         debug=debug
-    )
\ No newline at end of file
+    )
+
+
+def run_production():
+    # Background threads do not survive fork(), so workers start their own
+    os.environ['START_BACKGROUND_THREADS'] = 'False'
+    # Let the gRPC channels behind the Firestore client survive the fork
+    os.environ.setdefault('GRPC_ENABLE_FORK_SUPPORT', 'true')
+    os.environ.setdefault('GRPC_POLL_STRATEGY', 'poll')
+
+    from gunicorn.app.base import BaseApplication
+
+    import app as api
+
+    # Load Firebase, the catalogs and the read models once in the master;
+    # forked workers share them copy-on-write instead of starting cold
+    started = time.monotonic()
+    try:
+        api.warm_up()
+        print(f"Warmed up read models in {time.monotonic() - started:.2f}s")
+    except Exception as e:
+        print(f"Warm-up failed, workers will build read models on first use: {e}")
+
+    workers, threads = worker_settings(api)
+    options = {
+        'bind': f"0.0.0.0:{int(os.environ.get('PORT', 5000))}",
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'graceful_timeout': GRACEFUL_TIMEOUT,
+        'pidfile': PID_FILE,
+        'post_fork': lambda server, worker: api.after_fork(),
+    }
+    print(f"Starting gunicorn with {workers} worker(s) x {threads} thread(s) on {options['bind']}")
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return api.app
+
+    ProductionServer().run()
+
+
+def read_pid(path=PID_FILE):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def reload_production(timeout=60):
+    """Start a new master with fresh code on the same sockets, then gracefully stop the old one
+
+    SIGUSR2 makes gunicorn re-exec itself sharing the listening sockets,
+    so connections keep being accepted throughout. The new master writes
+    its PID to `<pidfile>.2` until the old one exits. SIGTERM then lets
+    the old workers finish their in-flight requests.
+    """
+    old_pid = read_pid()
+    if old_pid is None:
+        print(f"No running server found ({PID_FILE} is missing)")
+        return 1
+
+    os.kill(old_pid, signal.SIGUSR2)
+    deadline = time.monotonic() + timeout
+    new_pid = None
+    while new_pid is None:
+        if time.monotonic() > deadline:
+            print(f"New master did not start within {timeout}s; the old one keeps serving")
+            return 1
+        time.sleep(0.5)
+        new_pid = read_pid(PID_FILE + '.2')
+
+    time.sleep(RELOAD_SETTLE_SECONDS)
+    os.kill(old_pid, signal.SIGTERM)
+    print(f"Reloaded: master {new_pid} serving, {old_pid} draining")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the She Can Foundation API')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--production', action='store_true', help='Serve with pre-forked gunicorn workers')
+    group.add_argument('--reload', action='store_true', help='Gracefully reload a running production server')
+    args = parser.parse_args()
+
+    if args.production:
+        run_production()
+    elif args.reload:
+        sys.exit(reload_production())
+    else:
+        run_development()
@@ -0,0 +1,88 @@
+"""
+State shared between worker processes through memory-mapped files
+"""
+
+import mmap
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Shared state relies on POSIX record locks (not available on Windows)
+SHARED_STATE_SUPPORTED = fcntl is not None
+
+# Layout of a SharedVersion file: an 8-byte random token, then the counter
+TOKEN_SIZE = 8
+COUNTER_FORMAT = '<q'
+VERSION_FILE_SIZE = TOKEN_SIZE + struct.calcsize(COUNTER_FORMAT)
+
+
+class SharedVersion:
+    """A version counter in a memory-mapped file, shared by every process that opens it
+
+    Reads come straight from the mapping. Increments hold a thread lock and
+    a POSIX record lock on the file, so they are atomic across threads and
+    processes. The token changes on reset(), so a counter that starts over
+    for new data never repeats an earlier (token, value) pair.
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError('Shared state needs POSIX file locks, which this platform does not provide')
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if os.fstat(self._fd).st_size < VERSION_FILE_SIZE:
+                os.ftruncate(self._fd, VERSION_FILE_SIZE)
+                os.pwrite(self._fd, os.urandom(TOKEN_SIZE), 0)
+        self._map = mmap.mmap(self._fd, VERSION_FILE_SIZE)
+
+    def _locked(self):
+        return _FileLock(self._lock, self._fd)
+
+    @property
+    def token(self):
+        return self._map[:TOKEN_SIZE].hex()
+
+    @property
+    def value(self):
+        return struct.unpack_from(COUNTER_FORMAT, self._map, TOKEN_SIZE)[0]
+
+    def increment(self):
+        """Add one to the counter and return the new value"""
+        with self._locked():
+            value = self.value + 1
+            struct.pack_into(COUNTER_FORMAT, self._map, TOKEN_SIZE, value)
+        return value
+
+    def reset(self):
+        """Start over from zero under a new token"""
+        with self._locked():
+            self._map[:TOKEN_SIZE] = os.urandom(TOKEN_SIZE)
+            struct.pack_into(COUNTER_FORMAT, self._map, TOKEN_SIZE, 0)
+
+    def after_fork(self):
+        # The mapping and record lock stay valid; only the thread lock may
+        # have been held by a thread that did not survive the fork
+        self._lock = threading.Lock()
+
+
+class _FileLock:
+    """Hold a thread lock and an exclusive record lock on a file descriptor"""
+
+    def __init__(self, lock, fd):
+        self.lock = lock
+        self.fd = fd
+
+    def __enter__(self):
+        self.lock.acquire()
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
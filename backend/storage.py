@@ -0,0 +1,938 @@
+"""
+User storage backends: in-memory, Firestore, SQLite and shared memory
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from locking import StripedLock
+from shared_state import SHARED_STATE_SUPPORTED, SharedVersion
+from user_keys import user_doc_id
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+# Firestore accepts at most 30 values in one 'in' filter
+MAX_IN_VALUES = 30
+
+
+def fold_donation_ops(total, ops):
+    """Apply ('amount' | 'delta', value) operations to a total, returning each running total"""
+    totals = []
+    for kind, value in ops:
+        total = value if kind == 'amount' else total + value
+        totals.append(total)
+    return totals
+
+
+def project(user, fields):
+    """Return only `fields` of a user document, or the whole document when fields is None"""
+    if fields is None:
+        return user
+    return {field: user[field] for field in fields if field in user}
+
+
+def donations_of(user):
+    """Donations raised by a user document as a float"""
+    return float(user.get('donationsRaised', 0) or 0)
+
+
+class BlindWrite(dict):
+    """Empty "before" returned for a write sent without reading the user first
+
+    `update_time` is when the store applied the write, if it says.
+    """
+
+    def __init__(self, update_time=None):
+        super().__init__()
+        self.update_time = update_time
+
+
+class UserStore:
+    """Interface implemented by every user storage backend
+
+    Write methods return the user document as it was before the write
+    (or None if the user does not exist) so callers can keep derived read
+    models such as the leaderboard index in step.
+    """
+
+    name = 'base'
+
+    def get_user(self, email):
+        """Return a user document, or None"""
+        raise NotImplementedError
+
+    def get_users(self, emails):
+        """Return a dict of email -> user document or None"""
+        return {email: self.get_user(email) for email in emails}
+
+    def create_user(self, user_data):
+        """Store a new user; returns False if the email is already taken"""
+        raise NotImplementedError
+
+    def create_users(self, users):
+        """Store many new users; returns a created flag per user"""
+        return [self.create_user(user_data) for user_data in users]
+
+    def set_donations(self, email, amount):
+        """Overwrite a user's donations total"""
+        raise NotImplementedError
+
+    def increment_donations(self, email, delta):
+        """Atomically add `delta` to a user's donations total
+
+        Stores that send the increment without reading the user first
+        return an empty BlindWrite instead of the user before the write.
+        """
+        raise NotImplementedError
+
+    def bulk_update_donations(self, ops_by_email):
+        """Apply ('amount' | 'delta', value) operations per email
+
+        Returns a dict of email -> the user before the write, None if the
+        user does not exist, or the exception that made the write fail.
+        """
+        outcomes = {}
+        for email, ops in ops_by_email.items():
+            before = self.get_user(email)
+            if before is not None:
+                self.set_donations(email, fold_donation_ops(donations_of(before), ops)[-1])
+            outcomes[email] = before
+        return outcomes
+
+    def list_users(self, fields=None):
+        """Return every user document, reduced to `fields` if given"""
+        raise NotImplementedError
+
+    def page_users(self, limit, after=None, fields=None):
+        """Return (users, next_key) for up to `limit` users in a stable order
+
+        `after` is the next_key of the previous page; next_key is None on
+        the last page. Users are reduced to `fields` if given.
+        """
+        users = sorted(self.list_users(), key=lambda user: user.get('email', ''))
+        if after is not None:
+            users = [user for user in users if user.get('email', '') > after]
+        page = users[:limit]
+        return [project(user, fields) for user in page], (page[-1]['email'] if len(users) > limit else None)
+
+    def leaderboard_index(self):
+        """Backend-native leaderboard, or None to use the in-memory index"""
+        return None
+
+    def stats_aggregator(self):
+        """Backend-native stats, or None to use the in-memory aggregates"""
+        return None
+
+    def after_fork(self):
+        """Drop connections and threads inherited from the parent of a forked worker"""
+
+
+class MemoryUserStore(UserStore):
+    """Users held in a process-local dict keyed by email"""
+
+    name = 'memory'
+
+    def __init__(self, users):
+        self.users = users
+        self._locks = StripedLock()
+        self._sorted_emails = []
+
+    def get_user(self, email):
+        return self.users.get(email)
+
+    def create_user(self, user_data):
+        with self._locks.for_key(user_data['email']):
+            if user_data['email'] in self.users:
+                return False
+            self.users[user_data['email']] = user_data
+            return True
+
+    def set_donations(self, email, amount):
+        with self._locks.for_key(email):
+            if email not in self.users:
+                return None
+            before = dict(self.users[email])
+            self.users[email]['donationsRaised'] = amount
+            return before
+
+    def increment_donations(self, email, delta):
+        with self._locks.for_key(email):
+            if email not in self.users:
+                return None
+            before = dict(self.users[email])
+            self.users[email]['donationsRaised'] = donations_of(before) + delta
+            return before
+
+    def bulk_update_donations(self, ops_by_email):
+        outcomes = {}
+        for email, ops in ops_by_email.items():
+            with self._locks.for_key(email):
+                if email not in self.users:
+                    outcomes[email] = None
+                    continue
+                before = dict(self.users[email])
+                self.users[email]['donationsRaised'] = fold_donation_ops(donations_of(before), ops)[-1]
+                outcomes[email] = before
+        return outcomes
+
+    def list_users(self, fields=None):
+        if fields is None:
+            return list(self.users.values())
+        return [project(user, fields) for user in self.users.values()]
+
+    def page_users(self, limit, after=None, fields=None):
+        # Users are only ever added, so a length change means the sorted
+        # key list is stale
+        emails = self._sorted_emails
+        if len(emails) != len(self.users):
+            emails = self._sorted_emails = sorted(self.users)
+
+        start = 0 if after is None else bisect_right(emails, after)
+        page = [project(self.users[email], fields) for email in emails[start:start + limit] if email in self.users]
+        return page, (emails[start + limit - 1] if start + limit < len(emails) else None)
+
+
+class FirestoreUserStore(UserStore):
+    """Users stored in the Firestore `users` collection under email-keyed IDs"""
+
+    name = 'firestore'
+
+    def __init__(self, db, legacy_lookup=True, timeout=None):
+        self.db = db
+        self.users_ref = db.collection('users')
+        # Deadline in seconds applied to every Firestore RPC
+        self.timeout = timeout
+        # Fall back to an email query for documents not yet rekeyed by
+        # `python firebase_setup.py migrate`
+        self.legacy_lookup = legacy_lookup
+
+    def find_user_doc(self, email):
+        """Get a user's snapshot by its email-keyed document ID"""
+        doc = self.users_ref.document(user_doc_id(email)).get(timeout=self.timeout)
+        if doc.exists:
+            return doc
+
+        if self.legacy_lookup:
+            for doc in self.users_ref.where('email', '==', email).limit(1).stream(timeout=self.timeout):
+                return doc
+        return None
+
+    def get_user(self, email):
+        doc = self.find_user_doc(email)
+        return doc.to_dict() if doc else None
+
+    def get_users(self, emails):
+        docs = self.get_user_docs(emails)
+        return {email: docs[email].to_dict() if docs.get(email) else None for email in emails}
+
+    def get_user_docs(self, emails):
+        """Fetch many users with get_all; returns a dict of email -> snapshot"""
+        doc_ids = {user_doc_id(email): email for email in emails}
+        docs = {}
+        for start in range(0, len(emails), MAX_BATCH_WRITES):
+            refs = [self.users_ref.document(user_doc_id(email)) for email in emails[start:start + MAX_BATCH_WRITES]]
+            for doc in self.db.get_all(refs, timeout=self.timeout):
+                if doc.exists:
+                    docs[doc_ids[doc.id]] = doc
+
+        if self.legacy_lookup:
+            # Documents not yet rekeyed: one 'in' query per chunk of misses
+            missing = [email for email in dict.fromkeys(emails) if email not in docs]
+            for start in range(0, len(missing), MAX_IN_VALUES):
+                query = self.users_ref.where('email', 'in', missing[start:start + MAX_IN_VALUES])
+                for doc in query.stream(timeout=self.timeout):
+                    docs.setdefault(doc.get('email'), doc)
+        return docs
+
+    def create_user(self, user_data):
+        try:
+            self.users_ref.document(user_doc_id(user_data['email'])).create(user_data, timeout=self.timeout)
+            return True
+        except AlreadyExists:
+            return False
+
+    def create_users(self, users):
+        created = []
+        for start in range(0, len(users), MAX_BATCH_WRITES):
+            chunk = users[start:start + MAX_BATCH_WRITES]
+            batch = self.db.batch()
+            for user_data in chunk:
+                batch.create(self.users_ref.document(user_doc_id(user_data['email'])), user_data)
+            try:
+                batch.commit(timeout=self.timeout)
+                created.extend([True] * len(chunk))
+            except AlreadyExists:
+                # The whole batch is rejected if any document exists; retry
+                # one by one to find out which
+                created.extend(self.create_user(user_data) for user_data in chunk)
+        return created
+
+    def set_donations(self, email, amount):
+        doc = self.find_user_doc(email)
+        if doc is None:
+            return None
+        doc.reference.update({'donationsRaised': amount}, timeout=self.timeout)
+        return doc.to_dict()
+
+    def increment_donations(self, email, delta):
+        # One blind write: the document is not read first, since a read
+        # taken before the Increment says nothing about the total after it
+        change = {'donationsRaised': firestore.Increment(delta)}
+        try:
+            result = self.users_ref.document(user_doc_id(email)).update(change, timeout=self.timeout)
+            return BlindWrite(result.update_time)
+        except NotFound:
+            if not self.legacy_lookup:
+                return None
+
+        for doc in self.users_ref.where('email', '==', email).limit(1).stream(timeout=self.timeout):
+            result = doc.reference.update(change, timeout=self.timeout)
+            return BlindWrite(result.update_time)
+        return None
+
+    def bulk_update_donations(self, ops_by_email):
+        # A failed read has written nothing, so it is raised as a whole
+        docs = self.get_user_docs(list(ops_by_email))
+
+        # One write per user: an absolute amount anywhere in the sequence
+        # means the final total is written, otherwise the deltas are summed
+        # into a single atomic Increment
+        outcomes = {}
+        pending = []
+        for email, ops in ops_by_email.items():
+            doc = docs.get(email)
+            if doc is None:
+                outcomes[email] = None
+                continue
+
+            before = doc.to_dict()
+            if any(kind == 'amount' for kind, _ in ops):
+                change = {'donationsRaised': fold_donation_ops(donations_of(before), ops)[-1]}
+            else:
+                change = {'donationsRaised': firestore.Increment(sum(value for _, value in ops))}
+            pending.append((email, doc.reference, change, before))
+
+        for start in range(0, len(pending), MAX_BATCH_WRITES):
+            chunk = pending[start:start + MAX_BATCH_WRITES]
+            batch = self.db.batch()
+            for _, reference, change, _ in chunk:
+                batch.update(reference, change)
+
+            try:
+                batch.commit(timeout=self.timeout)
+            except Exception as e:
+                print(f"Firebase bulk update failed: {e}")
+                for email, _, _, _ in chunk:
+                    outcomes[email] = e
+                continue
+
+            for email, _, _, before in chunk:
+                outcomes[email] = before
+        return outcomes
+
+    def list_users(self, fields=None):
+        # A projection query only transfers the requested fields
+        query = self.users_ref.select(fields) if fields else self.users_ref
+        return [doc.to_dict() for doc in query.stream(timeout=self.timeout)]
+
+    def page_users(self, limit, after=None, fields=None):
+        # Ordered by document ID; one extra document tells us whether
+        # another page exists
+        query = self.users_ref.order_by('__name__').limit(limit + 1)
+        if fields:
+            query = query.select(fields)
+        if after is not None:
+            query = query.start_after({'__name__': after})
+        docs = list(query.stream(timeout=self.timeout))
+        page = docs[:limit]
+        return [doc.to_dict() for doc in page], (page[-1].id if len(docs) > limit else None)
+
+    def ping(self):
+        """Cheapest possible round trip, used to probe a tripped circuit"""
+        list(self.users_ref.limit(1).stream(timeout=self.timeout))
+
+
+class FallbackUserStore(UserStore):
+    """Send reads and writes to `primary`, falling back to `fallback` when it raises
+
+    Mirrors the original behaviour of serving mock data when Firestore
+    calls fail. Bulk writes and collection reads are not retried on the
+    fallback. With a circuit breaker, calls skip the primary entirely while
+    the circuit is open: single-user operations go straight to the
+    fallback and the rest raise CircuitOpenError.
+    """
+
+    def __init__(self, primary, fallback, breaker=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker
+        self.name = primary.name
+        self._lock = threading.Lock()
+        self.fallback_calls = 0
+
+    def _guarded(self, operation, *args):
+        method = getattr(self.primary, operation)
+        if self.breaker is None:
+            return method(*args)
+        return self.breaker.call(method, *args)
+
+    def _call(self, operation, *args):
+        if self.breaker is not None and not self.breaker.allow():
+            return self._fall_back(operation, *args)
+        try:
+            return self._guarded(operation, *args)
+        except Exception as e:
+            print(f"{self.primary.name} {operation} failed: {e}")
+            return self._fall_back(operation, *args)
+
+    def _fall_back(self, operation, *args):
+        with self._lock:
+            self.fallback_calls += 1
+        return getattr(self.fallback, operation)(*args)
+
+    @property
+    def in_fallback(self):
+        """True while calls are being short-circuited to the fallback"""
+        return self.breaker is not None and self.breaker.state != self.breaker.CLOSED
+
+    def get_user(self, email):
+        return self._call('get_user', email)
+
+    def get_users(self, emails):
+        return self._call('get_users', emails)
+
+    def create_user(self, user_data):
+        return self._call('create_user', user_data)
+
+    def create_users(self, users):
+        return self._guarded('create_users', users)
+
+    def set_donations(self, email, amount):
+        return self._call('set_donations', email, amount)
+
+    def increment_donations(self, email, delta):
+        return self._call('increment_donations', email, delta)
+
+    def bulk_update_donations(self, ops_by_email):
+        if self.breaker is None:
+            return self.primary.bulk_update_donations(ops_by_email)
+
+        # Chunks that failed part way come back as per-email exceptions and
+        # count against the circuit like a raise
+        self.breaker.check()
+        try:
+            outcomes = self.primary.bulk_update_donations(ops_by_email)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        if any(isinstance(outcome, Exception) for outcome in outcomes.values()):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return outcomes
+
+    def list_users(self, fields=None):
+        return self._guarded('list_users', fields)
+
+    def page_users(self, limit, after=None, fields=None):
+        return self._guarded('page_users', limit, after, fields)
+
+    def leaderboard_index(self):
+        return self.primary.leaderboard_index()
+
+    def stats_aggregator(self):
+        return self.primary.stats_aggregator()
+
+    def after_fork(self):
+        self.primary.after_fork()
+        self.fallback.after_fork()
+        if self.breaker is not None:
+            self.breaker.after_fork()
+
+
+class TimedUserStore(UserStore):
+    """Wrap a store and report the duration of every call to it
+
+    `observe(operation, seconds, failed)` is called after each call,
+    including calls that raise.
+    """
+
+    def __init__(self, store, observe):
+        self.store = store
+        self.observe = observe
+        self.name = store.name
+
+    @property
+    def breaker(self):
+        return getattr(self.store, 'breaker', None)
+
+    @property
+    def in_fallback(self):
+        return getattr(self.store, 'in_fallback', False)
+
+    def _timed(self, operation, *args):
+        started = time.perf_counter()
+        try:
+            result = getattr(self.store, operation)(*args)
+        except Exception:
+            self.observe(operation, time.perf_counter() - started, True)
+            raise
+        self.observe(operation, time.perf_counter() - started, False)
+        return result
+
+    def get_user(self, email):
+        return self._timed('get_user', email)
+
+    def get_users(self, emails):
+        return self._timed('get_users', emails)
+
+    def create_user(self, user_data):
+        return self._timed('create_user', user_data)
+
+    def create_users(self, users):
+        return self._timed('create_users', users)
+
+    def set_donations(self, email, amount):
+        return self._timed('set_donations', email, amount)
+
+    def increment_donations(self, email, delta):
+        return self._timed('increment_donations', email, delta)
+
+    def bulk_update_donations(self, ops_by_email):
+        return self._timed('bulk_update_donations', ops_by_email)
+
+    def list_users(self, fields=None):
+        return self._timed('list_users', fields)
+
+    def page_users(self, limit, after=None, fields=None):
+        return self._timed('page_users', limit, after, fields)
+
+    def leaderboard_index(self):
+        return self.store.leaderboard_index()
+
+    def stats_aggregator(self):
+        return self.store.stats_aggregator()
+
+    def after_fork(self):
+        self.store.after_fork()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    referralCode TEXT,
+    department TEXT,
+    donationsRaised REAL NOT NULL DEFAULT 0,
+    totalReferrals INTEGER NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_referral_code ON users (referralCode);
+CREATE INDEX IF NOT EXISTS idx_users_donations ON users (donationsRaised DESC, email);
+CREATE INDEX IF NOT EXISTS idx_users_department ON users (department);
+"""
+
+# Per-department user counts and sums, kept by triggers inside every write
+# transaction so stats never scan the users table. Created and filled from
+# the existing rows in one transaction on databases that predate it.
+SQLITE_TOTALS_SCHEMA = (
+    """CREATE TABLE department_totals (
+        department TEXT PRIMARY KEY,
+        users INTEGER NOT NULL,
+        donations REAL NOT NULL,
+        referrals INTEGER NOT NULL
+    )""",
+    """CREATE TRIGGER users_totals_insert AFTER INSERT ON users BEGIN
+        INSERT INTO department_totals (department, users, donations, referrals)
+        VALUES (IFNULL(NEW.department, 'Unknown'), 1, NEW.donationsRaised, NEW.totalReferrals)
+        ON CONFLICT (department) DO UPDATE SET
+            users = users + 1,
+            donations = donations + excluded.donations,
+            referrals = referrals + excluded.referrals;
+    END""",
+    """CREATE TRIGGER users_totals_update AFTER UPDATE OF department, donationsRaised, totalReferrals ON users BEGIN
+        UPDATE department_totals
+        SET users = users - 1, donations = donations - OLD.donationsRaised, referrals = referrals - OLD.totalReferrals
+        WHERE department = IFNULL(OLD.department, 'Unknown');
+        INSERT INTO department_totals (department, users, donations, referrals)
+        VALUES (IFNULL(NEW.department, 'Unknown'), 1, NEW.donationsRaised, NEW.totalReferrals)
+        ON CONFLICT (department) DO UPDATE SET
+            users = users + 1,
+            donations = donations + excluded.donations,
+            referrals = referrals + excluded.referrals;
+    END""",
+    """CREATE TRIGGER users_totals_delete AFTER DELETE ON users BEGIN
+        UPDATE department_totals
+        SET users = users - 1, donations = donations - OLD.donationsRaised, referrals = referrals - OLD.totalReferrals
+        WHERE department = IFNULL(OLD.department, 'Unknown');
+    END""",
+    """INSERT INTO department_totals (department, users, donations, referrals)
+    SELECT IFNULL(department, 'Unknown'), COUNT(*), SUM(donationsRaised), SUM(totalReferrals)
+    FROM users GROUP BY IFNULL(department, 'Unknown')""",
+)
+
+
+class SQLiteUserStore(UserStore):
+    """Users stored in a local SQLite database in WAL mode
+
+    The full document is kept as JSON; the columns used for lookups,
+    ranking and stats are stored alongside it and indexed. The
+    donationsRaised column is authoritative and is merged back into the
+    document on read.
+
+    `version` is a SharedVersion next to the database, bumped on every
+    write by any process using the file, so every worker agrees on the
+    data version behind its ETags. It is None where the platform has no
+    POSIX file locks.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, mmap_size=0):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        connection = self._connection()
+        connection.executescript(SQLITE_SCHEMA)
+        self._create_totals(connection)
+        self.version = SharedVersion(path + '-version') if SHARED_STATE_SUPPORTED else None
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if self.mmap_size:
+                connection.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _create_totals(connection):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'department_totals'"
+            ).fetchone()
+            if not exists:
+                for statement in SQLITE_TOTALS_SCHEMA:
+                    connection.execute(statement)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def after_fork(self):
+        # SQLite connections must not be used across a fork
+        self._local = threading.local()
+        if self.version is not None:
+            self.version.after_fork()
+
+    def _changed(self):
+        if self.version is not None:
+            self.version.increment()
+
+    @staticmethod
+    def _row_to_user(row):
+        user = json.loads(row[0])
+        user['donationsRaised'] = row[1]
+        return user
+
+    @staticmethod
+    def _user_row(user_data):
+        return (
+            user_data['email'],
+            user_data.get('referralCode'),
+            user_data.get('department', 'Unknown'),
+            donations_of(user_data),
+            int(user_data.get('totalReferrals', 0) or 0),
+            json.dumps(user_data),
+        )
+
+    def get_user(self, email):
+        row = self._connection().execute(
+            'SELECT doc, donationsRaised FROM users WHERE email = ?', (email,)
+        ).fetchone()
+        return self._row_to_user(row) if row else None
+
+    def get_users(self, emails):
+        users = dict.fromkeys(emails)
+        connection = self._connection()
+        for start in range(0, len(emails), MAX_BATCH_WRITES):
+            chunk = emails[start:start + MAX_BATCH_WRITES]
+            placeholders = ','.join('?' * len(chunk))
+            for row in connection.execute(
+                f'SELECT doc, donationsRaised FROM users WHERE email IN ({placeholders})', chunk
+            ):
+                user = self._row_to_user(row)
+                users[user['email']] = user
+        return users
+
+    def create_user(self, user_data):
+        try:
+            self._connection().execute(
+                'INSERT INTO users (email, referralCode, department, donationsRaised, totalReferrals, doc) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                self._user_row(user_data)
+            )
+        except sqlite3.IntegrityError:
+            return False
+        self._changed()
+        return True
+
+    def create_users(self, users):
+        created = []
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for user_data in users:
+                try:
+                    connection.execute(
+                        'INSERT INTO users (email, referralCode, department, donationsRaised, totalReferrals, doc) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        self._user_row(user_data)
+                    )
+                    created.append(True)
+                except sqlite3.IntegrityError:
+                    created.append(False)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        if any(created):
+            self._changed()
+        return created
+
+    def _update_donations(self, email, sql, value):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT doc, donationsRaised FROM users WHERE email = ?', (email,)
+            ).fetchone()
+            if row is None:
+                connection.execute('ROLLBACK')
+                return None
+            connection.execute(sql, (value, email))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        self._changed()
+        return self._row_to_user(row)
+
+    def set_donations(self, email, amount):
+        return self._update_donations(
+            email, 'UPDATE users SET donationsRaised = ? WHERE email = ?', amount
+        )
+
+    def increment_donations(self, email, delta):
+        return self._update_donations(
+            email, 'UPDATE users SET donationsRaised = donationsRaised + ? WHERE email = ?', delta
+        )
+
+    def bulk_update_donations(self, ops_by_email):
+        outcomes = {}
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for email, ops in ops_by_email.items():
+                row = connection.execute(
+                    'SELECT doc, donationsRaised FROM users WHERE email = ?', (email,)
+                ).fetchone()
+                if row is None:
+                    outcomes[email] = None
+                    continue
+                before = self._row_to_user(row)
+                connection.execute(
+                    'UPDATE users SET donationsRaised = ? WHERE email = ?',
+                    (fold_donation_ops(donations_of(before), ops)[-1], email)
+                )
+                outcomes[email] = before
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        if any(before is not None for before in outcomes.values()):
+            self._changed()
+        return outcomes
+
+    def list_users(self, fields=None):
+        return [
+            project(self._row_to_user(row), fields)
+            for row in self._connection().execute('SELECT doc, donationsRaised FROM users')
+        ]
+
+    def page_users(self, limit, after=None, fields=None):
+        rows = self._connection().execute(
+            'SELECT doc, donationsRaised FROM users WHERE email > ? ORDER BY email LIMIT ?',
+            ('' if after is None else after, limit + 1)
+        ).fetchall()
+        page = [self._row_to_user(row) for row in rows[:limit]]
+        return [project(user, fields) for user in page], (page[-1]['email'] if len(rows) > limit else None)
+
+    def leaderboard_index(self):
+        return SQLiteLeaderboard(self)
+
+    def stats_aggregator(self):
+        return SQLiteStats(self)
+
+
+class SharedUserStore(SQLiteUserStore):
+    """SQLite store on a memory-backed file shared by every worker process
+
+    Each process memory-maps the database (`mmap_size`), so lookups, the
+    leaderboard and stats read the same pages without copying them into
+    a per-connection cache. WAL mode lets reads run while a write commits;
+    writes are short single-row transactions. An empty database is seeded
+    with `seed_users` under a fresh version token.
+    """
+
+    name = 'shared'
+
+    def __init__(self, path, seed_users=(), mmap_size=256 * 1024 * 1024):
+        if not SHARED_STATE_SUPPORTED:
+            raise RuntimeError('The shared backend needs POSIX file locks, which this platform does not provide')
+        super().__init__(path, mmap_size=mmap_size)
+        if self._connection().execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0:
+            self.version.reset()
+            self.create_users([dict(user) for user in seed_users])
+
+
+class SQLiteLeaderboard:
+    """Leaderboard answered by indexed SQL queries instead of an in-memory index
+
+    Neighbors are read by walking idx_users_donations outwards from the
+    user, so only the rank itself costs a count of the users ahead.
+    """
+
+    ready = True
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return self.store._connection().execute(
+            'SELECT COALESCE(SUM(users), 0) FROM department_totals'
+        ).fetchone()[0]
+
+    def rebuild(self, users):
+        pass
+
+    def upsert(self, user):
+        pass
+
+    def remove(self, email):
+        pass
+
+    def _entries(self, rows, first_rank):
+        entries = []
+        for position, row in enumerate(rows, start=first_rank):
+            entry = self.store._row_to_user(row)
+            entry.pop('password', None)
+            entry['rank'] = position
+            entries.append(entry)
+        return entries
+
+    def page(self, offset=0, limit=None):
+        rows = self.store._connection().execute(
+            'SELECT doc, donationsRaised FROM users ORDER BY donationsRaised DESC, email LIMIT ? OFFSET ?',
+            (-1 if limit is None else limit, offset)
+        )
+        return self._entries(rows, offset + 1)
+
+    def _ahead(self, connection, donations, email):
+        # Two index range counts; a single OR of both conditions is not
+        # answered from the index and scans the whole table
+        return connection.execute(
+            'SELECT (SELECT COUNT(*) FROM users WHERE donationsRaised > ?)'
+            ' + (SELECT COUNT(*) FROM users WHERE donationsRaised = ? AND email < ?)',
+            (donations, donations, email)
+        ).fetchone()[0]
+
+    def rank_of(self, email):
+        connection = self.store._connection()
+        row = connection.execute('SELECT donationsRaised FROM users WHERE email = ?', (email,)).fetchone()
+        if row is None:
+            return None
+        return self._ahead(connection, row[0], email) + 1
+
+    def around(self, email, window):
+        connection = self.store._connection()
+        row = connection.execute('SELECT doc, donationsRaised FROM users WHERE email = ?', (email,)).fetchone()
+        if row is None:
+            return None, []
+        donations = row[1]
+        rank = self._ahead(connection, donations, email) + 1
+
+        above = connection.execute(
+            'SELECT doc, donationsRaised FROM users WHERE donationsRaised = ? AND email < ? ORDER BY email DESC LIMIT ?',
+            (donations, email, window)
+        ).fetchall()
+        if len(above) < window:
+            above += connection.execute(
+                'SELECT doc, donationsRaised FROM users WHERE donationsRaised > ? '
+                'ORDER BY donationsRaised, email DESC LIMIT ?',
+                (donations, window - len(above))
+            ).fetchall()
+
+        below = connection.execute(
+            'SELECT doc, donationsRaised FROM users WHERE donationsRaised = ? AND email > ? ORDER BY email LIMIT ?',
+            (donations, email, window)
+        ).fetchall()
+        if len(below) < window:
+            below += connection.execute(
+                'SELECT doc, donationsRaised FROM users WHERE donationsRaised < ? '
+                'ORDER BY donationsRaised DESC, email LIMIT ?',
+                (donations, window - len(below))
+            ).fetchall()
+
+        return rank, self._entries(above[::-1] + [row] + below, rank - len(above))
+
+
+class SQLiteStats:
+    """Stats read from the trigger-maintained department_totals table"""
+
+    ready = True
+    last_reconciliation = None
+
+    def __init__(self, store):
+        self.store = store
+
+    def rebuild(self, users):
+        pass
+
+    def apply(self, before, after):
+        pass
+
+    def snapshot(self):
+        rows = self.store._connection().execute(
+            'SELECT department, users, donations, referrals FROM department_totals WHERE users > 0'
+        ).fetchall()
+        total_users = sum(row[1] for row in rows)
+        total_donations = sum(row[2] for row in rows)
+        departments = {
+            dept: {'count': count, 'donations': round(donations, 2)}
+            for dept, count, donations, _ in rows
+        }
+        return {
+            'totalUsers': total_users,
+            'totalDonations': round(total_donations, 2),
+            'totalReferrals': sum(row[3] for row in rows),
+            'averageDonation': round(total_donations / total_users, 2) if total_users > 0 else 0,
+            'departments': departments
+        }
+
+    def reconcile(self, load_users):
+        # The totals change in the same transaction as the rows they
+        # summarize, so there is never any drift to correct
+        return {'timestamp': datetime.now().isoformat(), 'discrepancies': []}
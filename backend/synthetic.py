@@ -0,0 +1,96 @@
+"""
+Deterministic synthetic intern data for capacity and load testing
+"""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+FIRST_NAMES = [
+    'John', 'Jane', 'Alice', 'Bob', 'Sarah', 'Mike', 'Emma', 'David', 'Lisa', 'Chris',
+    'Maria', 'Alex', 'Sophie', 'Ryan', 'Nina', 'Priya', 'Omar', 'Grace', 'Leo', 'Hana'
+]
+LAST_NAMES = [
+    'Doe', 'Smith', 'Johnson', 'Wilson', 'Davis', 'Brown', 'Garcia', 'Martinez', 'Anderson', 'Taylor',
+    'Rodriguez', 'Thompson', 'White', 'Lee', 'Patel', 'Khan', 'Nguyen', 'Kim', 'Silva', 'Okafor'
+]
+DEPARTMENTS = [
+    'Communications', 'Community Relations', 'Content Creation', 'Corporate Relations',
+    'Digital Marketing', 'Events', 'Fundraising', 'Marketing', 'Outreach',
+    'Partnership Development', 'Program Development', 'Research', 'Social Media',
+    'Strategic Partnerships', 'Volunteer Coordination'
+]
+
+# Donations follow a log-normal distribution with a median of about $1,800,
+# matching the spread of the mock users (a long tail of top fundraisers)
+DONATION_MU = 7.5
+DONATION_SIGMA = 0.6
+
+FIRST_JOIN_DATE = date(2024, 6, 1)
+JOIN_WINDOW_DAYS = 220
+
+# Users are drawn in fixed blocks of indexes, each from its own seeded RNG,
+# so a user depends only on the seed and its index, never on batch sizes
+SEED_BLOCK_SIZE = 100
+
+
+def generate_user(rng, index):
+    """Build one synthetic user; `index` makes the email unique"""
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+    donations = round(rng.lognormvariate(DONATION_MU, DONATION_SIGMA), 2)
+    join_date = FIRST_JOIN_DATE + timedelta(days=rng.randrange(JOIN_WINDOW_DAYS))
+
+    return {
+        'email': f'{first_name.lower()}.{last_name.lower()}.{index}@example.org',
+        'firstName': first_name,
+        'lastName': last_name,
+        'password': 'password123',
+        'donationsRaised': donations,
+        'referralCode': f'{first_name.lower()}{last_name.lower()}{index}',
+        'createdAt': f'{join_date.isoformat()}T00:00:00Z',
+        'department': rng.choice(DEPARTMENTS),
+        'joinDate': join_date.isoformat(),
+        # Referrals track donations loosely, as they do in the mock users
+        'totalReferrals': max(0, int(donations / 150 + rng.gauss(0, 2)))
+    }
+
+
+def generate_users(count, seed=0, start=0):
+    """Return users start..start+count-1; user `i` is the same for a seed however it is requested"""
+    users = []
+    end = start + count
+    for block_start in range(start - start % SEED_BLOCK_SIZE, end, SEED_BLOCK_SIZE):
+        rng = random.Random(f'{seed}:{block_start // SEED_BLOCK_SIZE}')
+        for index in range(block_start, min(block_start + SEED_BLOCK_SIZE, end)):
+            # Users before `start` in its block are drawn only to advance the RNG
+            user = generate_user(rng, index)
+            if index >= start:
+                users.append(user)
+    return users
+
+
+def load_synthetic_users(store, count, seed=0, batch_size=500, workers=8, on_progress=None):
+    """Generate `count` users and write them through `store` in parallel batches
+
+    Users are seeded by index (see SEED_BLOCK_SIZE), so the data set is
+    identical whatever the worker count or batch size.
+    """
+    started = time.monotonic()
+    report = {'requested': count, 'created': 0, 'skipped': 0}
+
+    def load_batch(start):
+        users = generate_users(min(batch_size, count - start), seed=seed, start=start)
+        return store.create_users(users)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for created in executor.map(load_batch, range(0, count, batch_size)):
+            report['created'] += sum(1 for ok in created if ok)
+            report['skipped'] += sum(1 for ok in created if not ok)
+            if on_progress:
+                on_progress(report['created'] + report['skipped'], count, time.monotonic() - started)
+
+    report['seconds'] = round(time.monotonic() - started, 3)
+    report['rowsPerSecond'] = round(count / report['seconds'], 1) if report['seconds'] > 0 else None
+    return report
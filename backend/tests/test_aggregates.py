@@ -0,0 +1,47 @@
+from aggregates import StatsAggregator
+
+
+def user(email, donations, department='Eng', referrals=0):
+    return {'email': email, 'donationsRaised': donations, 'department': department, 'totalReferrals': referrals}
+
+
+def test_apply_moves_totals_between_departments():
+    stats = StatsAggregator()
+    stats.rebuild([user('a@x.org', 10), user('b@x.org', 5, 'Ops', 2)])
+    stats.apply(user('a@x.org', 10), user('a@x.org', 15, 'Ops'))
+    stats.apply(None, user('c@x.org', 1))
+
+    snapshot = stats.snapshot()
+    assert snapshot['totalUsers'] == 3
+    assert snapshot['totalDonations'] == 21
+    assert snapshot['totalReferrals'] == 2
+    assert snapshot['departments'] == {'Ops': {'count': 2, 'donations': 20}, 'Eng': {'count': 1, 'donations': 1}}
+
+
+def test_reconcile_reports_and_corrects_drift():
+    stats = StatsAggregator()
+    stats.rebuild([user('a@x.org', 10)])
+
+    report = stats.reconcile(lambda: [user('a@x.org', 10), user('b@x.org', 4)])
+    assert [diff['field'] for diff in report['discrepancies']] == ['users', 'donations', 'departments.Eng']
+    assert stats.snapshot()['totalDonations'] == 14
+
+
+def test_reconcile_keeps_writes_applied_during_the_scan():
+    stats = StatsAggregator()
+    stats.rebuild([user('a@x.org', 10), user('b@x.org', 20)])
+
+    def load_users():
+        # a's write landed before the scan read it, c's and b's after
+        stats.apply(user('a@x.org', 10), user('a@x.org', 12))
+        stats.apply(user('a@x.org', 12), user('a@x.org', 15))
+        stats.apply(None, user('c@x.org', 7))
+        stats.apply(user('b@x.org', 20), None)
+        return [user('a@x.org', 12), user('b@x.org', 20)]
+
+    report = stats.reconcile(load_users)
+    assert report['discrepancies'] == []
+    snapshot = stats.snapshot()
+    assert snapshot['totalUsers'] == 2
+    assert snapshot['totalDonations'] == 22
+    assert stats._journal is None
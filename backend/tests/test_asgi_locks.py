@@ -0,0 +1,33 @@
+import asyncio
+import importlib
+import os
+
+import httpx
+
+
+def test_concurrent_increments_to_one_user_all_finish(tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'users.db'))
+    monkeypatch.setenv('START_BACKGROUND_THREADS', 'False')
+    monkeypatch.setenv('STATS_RECONCILE_INTERVAL', '0')
+    monkeypatch.setenv('LEADERBOARD_RECONCILE_INTERVAL', '0')
+    asgi_app = importlib.import_module('asgi_app')
+    sync_app = importlib.import_module('app')
+    sync_app.user_store.create_user({'email': 'hot@x.org', 'password': 'pw', 'department': 'Eng',
+                                     'donationsRaised': 0, 'totalReferrals': 0})
+
+    # More requests than the default executor has threads, all on one lock
+    count = 4 * min(32, (os.cpu_count() or 1) + 4)
+
+    async def fire():
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await asyncio.gather(*(
+                client.post('/api/user/donations/hot@x.org/increment', json={'amount': 1})
+                for _ in range(count)
+            ))
+
+    responses = asyncio.run(asyncio.wait_for(fire(), timeout=60))
+
+    assert [response.status_code for response in responses] == [200] * count
+    assert sync_app.user_store.get_user('hot@x.org')['donationsRaised'] == count
@@ -0,0 +1,47 @@
+import io
+import json
+
+from importer import import_users, iter_records
+from storage import MemoryUserStore
+
+
+def row(**fields):
+    user = {'email': 'a@x.org', 'password': 'pw', 'firstName': 'Ada', 'lastName': 'Lovelace'}
+    user.update(fields)
+    return user
+
+
+def run_import(records):
+    return import_users(records, MemoryUserStore({}))
+
+
+def test_wrong_field_types_fail_only_their_row():
+    report = run_import([row(email=5), row(firstName=['Ada']), row(email='b@x.org')])
+
+    assert report['imported'] == 1
+    assert report['failed'] == 2
+    assert [error['row'] for error in report['errors']] == [1, 2]
+    assert report['errors'][0]['error'] == 'Fields must be strings: email'
+
+
+def test_non_finite_donations_are_rejected():
+    report = run_import([row(donationsRaised='nan'), row(email='b@x.org', donationsRaised='inf')])
+
+    assert report['imported'] == 0
+    assert report['failed'] == 2
+
+
+def test_ndjson_rows_with_numbers_in_text_fields_are_reported():
+    text = io.StringIO(json.dumps(row(lastName=7)) + '\n')
+    report = run_import(iter_records(text, 'ndjson'))
+
+    assert report['errors'] == [{'row': 1, 'email': 'a@x.org', 'error': 'Fields must be strings: lastName'}]
+
+
+def test_csv_with_a_byte_order_mark_imports():
+    data = '\ufeffemail,password,firstName,lastName\na@x.org,pw,Ada,Lovelace\n'.encode('utf-8')
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', newline='')
+    report = run_import(iter_records(text, 'csv'))
+
+    assert report['imported'] == 1
+    assert report['failed'] == 0
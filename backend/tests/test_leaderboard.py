@@ -0,0 +1,123 @@
+from leaderboard import LeaderboardIndex, rank_key
+
+
+def user(email, donations, **fields):
+    return {'email': email, 'donationsRaised': donations, 'password': 'secret', **fields}
+
+
+def emails(entries):
+    return [entry['email'] for entry in entries]
+
+
+def test_rebuild_ranks_by_donations_and_strips_passwords():
+    index = LeaderboardIndex()
+    index.rebuild([user('b@x.org', 10), user('a@x.org', 30), user('c@x.org', 20)])
+
+    page = index.page()
+    assert emails(page) == ['a@x.org', 'c@x.org', 'b@x.org']
+    assert [entry['rank'] for entry in page] == [1, 2, 3]
+    assert all('password' not in entry for entry in page)
+    assert len(index) == 3
+
+
+def test_ties_are_broken_by_email():
+    index = LeaderboardIndex()
+    index.rebuild([user('c@x.org', 50), user('a@x.org', 50), user('b@x.org', 50)])
+
+    assert emails(index.page()) == ['a@x.org', 'b@x.org', 'c@x.org']
+    assert index.rank_of('b@x.org') == 2
+
+
+def test_upsert_repositions_an_existing_user():
+    index = LeaderboardIndex()
+    index.rebuild([user('a@x.org', 30), user('b@x.org', 20), user('c@x.org', 10)])
+
+    index.upsert(user('c@x.org', 100))
+    assert emails(index.page()) == ['c@x.org', 'a@x.org', 'b@x.org']
+
+    index.upsert(user('c@x.org', 0))
+    assert emails(index.page()) == ['a@x.org', 'b@x.org', 'c@x.org']
+    assert len(index) == 3
+
+
+def test_upsert_into_a_tie_keeps_one_entry_per_user():
+    index = LeaderboardIndex()
+    index.rebuild([user('a@x.org', 20), user('b@x.org', 20)])
+
+    index.upsert(user('b@x.org', 20, firstName='Bea'))
+    assert emails(index.page()) == ['a@x.org', 'b@x.org']
+    assert index.page(1, 1)[0]['firstName'] == 'Bea'
+
+
+def test_remove_of_an_unknown_user_is_a_no_op():
+    index = LeaderboardIndex()
+    index.rebuild([user('a@x.org', 20)])
+
+    index.remove('nobody@x.org')
+    assert emails(index.page()) == ['a@x.org']
+    assert index.rank_of('nobody@x.org') is None
+
+
+def test_discard_skips_a_key_that_is_not_indexed():
+    index = LeaderboardIndex()
+    index.rebuild([user('a@x.org', 20), user('b@x.org', 10)])
+    # An entry whose key is missing from the sorted keys must not remove a neighbour's key
+    index._users['a@x.org'] = user('a@x.org', 15)
+
+    index.remove('a@x.org')
+    assert index._keys == [rank_key(user('a@x.org', 20)), rank_key(user('b@x.org', 10))]
+    assert 'a@x.org' not in index._users
+
+
+def test_page_and_around():
+    index = LeaderboardIndex()
+    index.rebuild([user(f'{n}@x.org', n) for n in range(10)])
+
+    assert emails(index.page(2, 3)) == ['7@x.org', '6@x.org', '5@x.org']
+    rank, neighbors = index.around('5@x.org', 1)
+    assert rank == 5
+    assert emails(neighbors) == ['6@x.org', '5@x.org', '4@x.org']
+    assert index.around('missing@x.org', 1) == (None, [])
+
+
+def test_reconcile_picks_up_users_written_elsewhere():
+    index = LeaderboardIndex()
+    index.rebuild([user('a@x.org', 10)])
+
+    report = index.reconcile(lambda: [user('a@x.org', 10), user('b@x.org', 40)])
+    assert report['drifted'] == 1
+    assert report['sample'] == ['b@x.org']
+    assert emails(index.page()) == ['b@x.org', 'a@x.org']
+
+
+def test_reconcile_replays_writes_made_during_the_scan():
+    index = LeaderboardIndex()
+    index.rebuild([user('a@x.org', 10), user('b@x.org', 20)])
+
+    def load_users():
+        # Snapshot taken before these writes reached the store's scan
+        snapshot = [user('a@x.org', 10), user('b@x.org', 20)]
+        index.upsert(user('a@x.org', 99))
+        index.upsert(user('c@x.org', 5))
+        index.remove('b@x.org')
+        return snapshot
+
+    report = index.reconcile(load_users)
+    assert report['drifted'] == 0
+    assert emails(index.page()) == ['a@x.org', 'c@x.org']
+    assert index.page()[0]['donationsRaised'] == 99
+
+
+def test_reconcile_failure_stops_journaling():
+    index = LeaderboardIndex()
+    index.rebuild([user('a@x.org', 10)])
+
+    def load_users():
+        raise RuntimeError('backend down')
+
+    try:
+        index.reconcile(load_users)
+    except RuntimeError:
+        pass
+    assert index._journal is None
+    assert emails(index.page()) == ['a@x.org']
@@ -0,0 +1,143 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from replica import FirestoreReplica
+
+
+class FakeUsersRef:
+    """Stands in for a collection reference; the test drives the snapshot callback"""
+
+    def __init__(self):
+        self.callback = None
+        self.watches = []
+
+    def on_snapshot(self, callback):
+        self.callback = callback
+        watch = SimpleNamespace(is_active=True)
+        watch.unsubscribe = lambda: setattr(watch, 'is_active', False)
+        self.watches.append(watch)
+        return watch
+
+
+def doc(doc_id, **user):
+    return SimpleNamespace(id=doc_id, to_dict=lambda: dict(user))
+
+
+def change(kind, document):
+    return SimpleNamespace(type=SimpleNamespace(name=kind), document=document)
+
+
+def start_replica(initial_docs):
+    users_ref = FakeUsersRef()
+    events = []
+    resyncs = []
+    replica = FirestoreReplica(
+        users_ref,
+        on_change=lambda before, after: events.append((before, after)),
+        on_resync=lambda: resyncs.append(True)
+    )
+    replica.start()
+    users_ref.callback(initial_docs, [], None)
+    return replica, users_ref, events, resyncs
+
+
+def test_initial_snapshot_triggers_a_resync_not_per_user_changes():
+    replica, _, events, resyncs = start_replica([doc('a', email='a@x.org', donationsRaised=1)])
+
+    assert events == []
+    assert resyncs == [True]
+    assert replica.get('a@x.org')['donationsRaised'] == 1
+
+
+def test_listener_changes_reach_on_change_with_before_and_after():
+    replica, users_ref, events, _ = start_replica([doc('a', email='a@x.org', donationsRaised=1)])
+
+    users_ref.callback([], [
+        change('MODIFIED', doc('a', email='a@x.org', donationsRaised=5)),
+        change('ADDED', doc('b', email='b@x.org', donationsRaised=2)),
+    ], None)
+    users_ref.callback([], [change('REMOVED', doc('a'))], None)
+
+    assert events == [
+        ({'email': 'a@x.org', 'donationsRaised': 1}, {'email': 'a@x.org', 'donationsRaised': 5}),
+        (None, {'email': 'b@x.org', 'donationsRaised': 2}),
+        ({'email': 'a@x.org', 'donationsRaised': 5}, None),
+    ]
+    assert replica.get('a@x.org') is None
+
+
+def test_local_put_and_its_listener_event_apply_once():
+    replica, users_ref, events, _ = start_replica([doc('a', email='a@x.org', donationsRaised=1)])
+
+    assert replica.put({'email': 'a@x.org', 'donationsRaised': 11})
+    users_ref.callback([], [change('MODIFIED', doc('a', email='a@x.org', donationsRaised=11))], None)
+
+    assert events == [({'email': 'a@x.org', 'donationsRaised': 1}, {'email': 'a@x.org', 'donationsRaised': 11})]
+
+
+def test_listener_corrects_a_local_put_that_raced_another_writer():
+    replica, users_ref, events, _ = start_replica([doc('a', email='a@x.org', donationsRaised=100)])
+
+    replica.put({'email': 'a@x.org', 'donationsRaised': 110})
+    users_ref.callback([], [change('MODIFIED', doc('a', email='a@x.org', donationsRaised=120))], None)
+
+    assert events[-1] == ({'email': 'a@x.org', 'donationsRaised': 110}, {'email': 'a@x.org', 'donationsRaised': 120})
+
+
+def test_put_is_refused_until_synced():
+    replica = FirestoreReplica(FakeUsersRef())
+    assert not replica.put({'email': 'a@x.org'})
+
+
+def test_an_unstarted_replica_only_subscribes_after_the_fork():
+    users_ref = FakeUsersRef()
+    replica = FirestoreReplica(users_ref)
+
+    assert not replica.healthy
+    assert users_ref.callback is None
+
+    replica.after_fork()
+    users_ref.callback([doc('a', email='a@x.org', donationsRaised=1)], [], None)
+
+    assert replica.healthy
+
+
+def test_a_blind_increment_is_counted_once_whether_or_not_its_event_arrived():
+    written_at = datetime(2026, 1, 1, 12, 0, 1, tzinfo=timezone.utc)
+    stale = doc('a', email='a@x.org', donationsRaised=10)
+    stale.update_time = written_at - timedelta(seconds=1)
+    replica, users_ref, _, _ = start_replica([stale])
+
+    assert replica.donations_after('a@x.org', 5, written_at) == 15
+
+    applied = doc('a', email='a@x.org', donationsRaised=15)
+    applied.update_time = written_at
+    users_ref.callback([], [change('MODIFIED', applied)], None)
+
+    assert replica.donations_after('a@x.org', 5, written_at) == 15
+
+
+def test_a_dropped_listener_is_replaced_by_the_retry_thread_not_by_readers():
+    users_ref = FakeUsersRef()
+    replica = FirestoreReplica(users_ref, retry_interval=0.01)
+    replica.start()
+    users_ref.callback([doc('a', email='a@x.org', donationsRaised=1)], [], None)
+    users_ref.watches[0].is_active = False
+
+    readers = [threading.Thread(target=lambda: replica.healthy) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    assert not replica.healthy
+
+    deadline = time.monotonic() + 5
+    while len(users_ref.watches) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    users_ref.callback([doc('a', email='a@x.org', donationsRaised=2)], [], None)
+
+    assert replica.healthy
+    assert [watch.is_active for watch in users_ref.watches] == [False, True]
+    assert replica.get('a@x.org')['donationsRaised'] == 2
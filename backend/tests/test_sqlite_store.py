@@ -0,0 +1,69 @@
+import sqlite3
+
+from storage import SQLITE_SCHEMA, SQLiteUserStore
+
+
+def user(email, donations, department='Eng', referrals=0):
+    return {'email': email, 'password': 'pw', 'department': department,
+            'donationsRaised': donations, 'totalReferrals': referrals}
+
+
+def expected_stats(store):
+    users = store.list_users()
+    departments = {}
+    for entry in users:
+        dept = departments.setdefault(entry['department'], {'count': 0, 'donations': 0})
+        dept['count'] += 1
+        dept['donations'] = round(dept['donations'] + entry['donationsRaised'], 2)
+    return len(users), round(sum(entry['donationsRaised'] for entry in users), 2), departments
+
+
+def test_totals_follow_every_kind_of_write(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / 'users.db'))
+    store.create_user(user('a@x.org', 10, referrals=2))
+    store.create_users([user('b@x.org', 5, 'Ops'), user('c@x.org', 1, 'Ops', referrals=1)])
+    store.set_donations('a@x.org', 20)
+    store.increment_donations('b@x.org', 2.5)
+    store.bulk_update_donations({'c@x.org': [('delta', 1), ('amount', 4)]})
+
+    snapshot = store.stats_aggregator().snapshot()
+    total_users, total_donations, departments = expected_stats(store)
+    assert snapshot['totalUsers'] == total_users == 3
+    assert snapshot['totalDonations'] == total_donations == 31.5
+    assert snapshot['totalReferrals'] == 3
+    assert snapshot['departments'] == departments
+    assert len(store.leaderboard_index()) == 3
+
+
+def test_totals_are_filled_for_a_database_created_before_them(tmp_path):
+    path = str(tmp_path / 'old.db')
+    connection = sqlite3.connect(path)
+    connection.executescript(SQLITE_SCHEMA)
+    connection.execute(
+        "INSERT INTO users (email, department, donationsRaised, totalReferrals, doc) VALUES ('a@x.org', 'Eng', 7, 1, '{}')"
+    )
+    connection.commit()
+    connection.close()
+
+    snapshot = SQLiteUserStore(path).stats_aggregator().snapshot()
+    assert snapshot['totalUsers'] == 1
+    assert snapshot['departments'] == {'Eng': {'count': 1, 'donations': 7}}
+    # Opening the store again does not count the rows twice
+    assert SQLiteUserStore(path).stats_aggregator().snapshot()['totalUsers'] == 1
+
+
+def test_around_walks_out_from_the_user_across_ties(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / 'users.db'))
+    donations = [50, 40, 40, 40, 30, 30, 20, 10]
+    store.create_users([user(f'u{i}@x.org', amount) for i, amount in enumerate(donations)])
+    leaderboard = store.leaderboard_index()
+    ranked = leaderboard.page()
+
+    for position, entry in enumerate(ranked):
+        for window in (0, 1, 2, 5):
+            rank, neighbors = leaderboard.around(entry['email'], window)
+            assert rank == position + 1
+            start = max(position - window, 0)
+            assert neighbors == ranked[start:position + window + 1]
+
+    assert leaderboard.around('missing@x.org', 2) == (None, [])
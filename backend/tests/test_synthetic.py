@@ -0,0 +1,27 @@
+from synthetic import SEED_BLOCK_SIZE, generate_users, load_synthetic_users
+from storage import MemoryUserStore
+
+
+def test_users_do_not_depend_on_how_the_range_is_split():
+    whole = generate_users(450, seed=7)
+
+    for batch_size in (1, 37, SEED_BLOCK_SIZE, 128, 500):
+        parts = []
+        for start in range(0, 450, batch_size):
+            parts += generate_users(min(batch_size, 450 - start), seed=7, start=start)
+        assert parts == whole
+
+
+def test_seed_changes_the_users():
+    assert generate_users(5, seed=1) != generate_users(5, seed=2)
+    assert len({user['email'] for user in generate_users(300, seed=1)}) == 300
+
+
+def test_loaded_data_set_is_the_same_for_any_batch_size():
+    stores = []
+    for batch_size in (64, 500):
+        store = MemoryUserStore({})
+        report = load_synthetic_users(store, 300, seed=3, batch_size=batch_size, workers=4)
+        assert report['created'] == 300
+        stores.append(sorted(store.list_users(), key=lambda user: user['email']))
+    assert stores[0] == stores[1]
@@ -0,0 +1,76 @@
+"""
+Bounded in-process cache for user lookups by email
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """LRU cache of user documents whose entries expire after `ttl` seconds"""
+
+    def __init__(self, max_size=1024, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, email):
+        """Return a copy of the cached user, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[email]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return dict(user)
+
+    def put(self, user):
+        """Cache a user document, evicting the least recently used entry if full"""
+        email = user.get('email')
+        if not email or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, email):
+        """Drop a cached user"""
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        """Drop every cached user"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
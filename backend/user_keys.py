@@ -0,0 +1,19 @@
+"""
+Deterministic Firestore document IDs for user documents
+"""
+
+import hashlib
+
+
+def normalize_email(email):
+    """Canonical form of an email address used for keying users"""
+    return (email or '').strip().lower()
+
+
+def user_doc_id(email):
+    """Document ID for a user: SHA-256 of the normalized email
+
+    Hashing keeps IDs a fixed length and free of characters Firestore
+    rejects in document IDs (such as '/').
+    """
+    return hashlib.sha256(normalize_email(email).encode('utf-8')).hexdigest()
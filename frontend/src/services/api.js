@@ -42,6 +42,15 @@ export const userAPI = {
     }
   },
 
+  getBatchDonations: async (emails) => {
+    try {
+      const response = await api.post('/user/donations/batch', { emails });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || { error: 'Network error' };
+    }
+  },
+
   updateDonations: async (email, amount) => {
     try {
       const response = await api.put(`/user/donations/${encodeURIComponent(email)}`, {
@@ -53,6 +62,17 @@ export const userAPI = {
     }
   },
 
+  incrementDonations: async (email, amount) => {
+    try {
+      const response = await api.post(`/user/donations/${encodeURIComponent(email)}/increment`, {
+        amount: amount
+      });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || { error: 'Network error' };
+    }
+  },
+
   getAllUsers: async () => {
     try {
       const response = await api.get('/users');
@@ -64,7 +84,21 @@ export const userAPI = {
 
   getLeaderboard: async () => {
     try {
-      const response = await api.get('/leaderboard');
+      // Only the fields the leaderboard renders
+      const response = await api.get('/leaderboard', {
+        params: { fields: 'rank,email,firstName,lastName,donationsRaised,referralCode' }
+      });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || { error: 'Network error' };
+    }
+  },
+
+  getRank: async (email, window = 5) => {
+    try {
+      const response = await api.get(`/leaderboard/rank/${encodeURIComponent(email)}`, {
+        params: { window }
+      });
       return response.data;
     } catch (error) {
       throw error.response?.data || { error: 'Network error' };